@@ -0,0 +1,68 @@
+# benchmark_pool.py
+"""Compare per-call AsyncClient setup against the pooled WeatherService client.
+
+Run with:
+    python benchmark_pool.py [requests]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# The stub server needs no real key, but the service checks for one
+# (Config.validate) before its first request
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+import httpx
+from stub_server import StubWeatherServer
+from weather_service import WeatherService
+
+
+async def per_call_client(url: str, count: int) -> list:
+    """Old behaviour: a fresh AsyncClient (and connection) for every lookup."""
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(url, params={"q": "London"})
+            response.json()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def pooled_client(url: str, count: int) -> list:
+    """New behaviour: one WeatherService reusing keep-alive connections."""
+    timings = []
+    async with WeatherService() as service:
+        service.base_url = url
+        service.limiter = None  # measure the client, not the API quota
+        for _ in range(count):
+            start = time.perf_counter()
+            await service.get_weather("London", use_cache=False)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list):
+    ms = [t * 1000 for t in timings]
+    print(
+        f"{label:<18} mean {statistics.mean(ms):7.3f} ms   "
+        f"p50 {statistics.median(ms):7.3f} ms   "
+        f"max {max(ms):7.3f} ms"
+    )
+
+
+async def main(count: int):
+    with StubWeatherServer() as server:
+        # Warm up the interpreter and the server threads
+        await pooled_client(server.url, 5)
+
+        print(f"{count} sequential lookups against {server.url}\n")
+        report("per-call client", await per_call_client(server.url, count))
+        report("pooled client", await pooled_client(server.url, count))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
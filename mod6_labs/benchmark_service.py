@@ -0,0 +1,208 @@
+# benchmark_service.py
+"""Load benchmark for WeatherService against a local OpenWeatherMap stub.
+
+Run with:
+    python benchmark_service.py                       # compare with baseline
+    python benchmark_service.py --save                # store as the baseline
+    python benchmark_service.py --latency 0.05 --error-rate 0.02
+    python benchmark_service.py --transport mock --concurrency 1,64,512
+
+For each concurrency level, `--requests` uncached lookups are driven
+through one WeatherService `--repeat` times, and the median run reports
+throughput, latency percentiles, status codes, retries and peak pool usage. A second pass
+under tracemalloc reports peak Python memory (it is kept separate because
+tracing slows everything down). Exits with status 1 if throughput drops or
+p95 latency rises more than TOLERANCE against the baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# The stub needs no real key
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark")
+
+from metrics import Metrics
+from stub_server import Faults, StubWeatherServer, mock_client
+from weather_service import WeatherService, WeatherServiceError
+
+TOLERANCE = 0.20  # fail on >20% worse than baseline
+BASELINE_FILE = "service_baseline.json"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def make_service(args, server) -> WeatherService:
+    client = mock_client(args.faults) if server is None else None
+    service = WeatherService(client=client)
+    if server is not None:
+        service.base_url = server.url
+    service.limiter = None  # measure the service, not the API quota
+    service.retry.base_delay = args.retry_delay
+    service.retry.max_delay = args.retry_delay * 8
+    # Injected errors are the point of the exercise; don't fail fast on them
+    service.breaker.failure_threshold = float("inf")
+    return service
+
+
+async def drive(service: WeatherService, requests: int, concurrency: int) -> dict:
+    """Issue `requests` uncached lookups, `concurrency` at a time."""
+    latencies = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in queue:
+            start = time.perf_counter()
+            try:
+                # Distinct cities, so coalescing never merges requests
+                await service.get_weather(f"City {i}", use_cache=False)
+            except WeatherServiceError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput_rps": requests / elapsed,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "errors": errors,
+    }
+
+
+async def run_level(args, server, concurrency: int) -> dict:
+    runs = []
+    async with make_service(args, server) as service:
+        await drive(service, min(args.requests, 20), min(concurrency, 4))  # warm up
+        for _ in range(args.repeat):
+            service.metrics = metrics = Metrics()
+            run = await drive(service, args.requests, concurrency)
+            stats = metrics.to_dict()
+            run["status_codes"] = stats["requests"]["by_status"]
+            run["retries"] = stats["retries"]
+            run["pool_peak"] = stats["pool"]["peak"]
+            runs.append(run)
+    # Keep the median run by throughput, which damps one-off scheduler noise
+    runs.sort(key=lambda r: r["throughput_rps"])
+    result = runs[len(runs) // 2]
+
+    # Same workload again, traced, for memory
+    async with make_service(args, server) as service:
+        tracemalloc.start()
+        await drive(service, args.requests, concurrency)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    result["peak_memory_kb"] = peak / 1024
+    return result
+
+
+async def run(args) -> dict:
+    levels = [int(c) for c in args.concurrency.split(",")]
+    results = {}
+    if args.transport == "http":
+        with StubWeatherServer(faults=args.faults) as server:
+            for level in levels:
+                results[str(level)] = await run_level(args, server, level)
+    else:
+        for level in levels:
+            results[str(level)] = await run_level(args, None, level)
+    return results
+
+
+def report(results: dict):
+    print(
+        f"{'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'errors':>6} {'retries':>7} {'pool':>5} {'peak KiB':>9}"
+    )
+    for level, r in results.items():
+        print(
+            f"{level:>5} {r['throughput_rps']:9.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+            f"{r['p99_ms']:8.2f} {r['errors']:6d} {r['retries']:7d} {r['pool_peak']:5d} "
+            f"{r['peak_memory_kb']:9.0f}"
+        )
+
+
+def compare(results: dict, baseline: dict) -> bool:
+    """Print changes against the baseline; return True if anything regressed."""
+    regressed = False
+    print("\nvs baseline")
+    for level, r in results.items():
+        base = baseline.get(level)
+        if base is None:
+            continue
+        throughput = r["throughput_rps"] / base["throughput_rps"] - 1
+        p95 = r["p95_ms"] / base["p95_ms"] - 1
+        worse = throughput < -TOLERANCE or p95 > TOLERANCE
+        regressed = regressed or worse
+        flag = "  REGRESSION" if worse else ""
+        print(f"  concurrency {level:>4}: throughput {throughput:+.1%}, p95 {p95:+.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400, help="lookups per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated levels")
+    parser.add_argument("--transport", choices=("http", "mock"), default="http",
+                        help="local HTTP stub server, or in-process httpx.MockTransport")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="status code of injected failures")
+    parser.add_argument("--retry-delay", type=float, default=0.01, help="base retry backoff in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per level (median kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--baseline", default=os.path.join(HERE, BASELINE_FILE))
+    args = parser.parse_args()
+    args.faults = Faults(args.latency, args.jitter, args.error_rate, args.error_status, args.seed)
+
+    print(
+        f"{args.requests} lookups per level over {args.transport}, latency {args.latency * 1000:.0f} ms "
+        f"(+{args.jitter * 1000:.0f} ms jitter), error rate {args.error_rate:.1%}\n"
+    )
+    results = asyncio.run(run(args))
+    report(results)
+
+    # Results are only comparable under the same settings
+    settings = {
+        key: getattr(args, key)
+        for key in ("requests", "transport", "latency", "jitter", "error_rate", "error_status", "retry_delay")
+    }
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {os.path.basename(args.baseline)}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print("\nBaseline was recorded with different settings; not comparing")
+        elif compare(results, baseline["results"]):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
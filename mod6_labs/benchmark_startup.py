@@ -0,0 +1,131 @@
+# benchmark_startup.py
+"""Startup benchmark: import cost and time-to-first-frame of the Weather App.
+
+Run with:
+    python benchmark_startup.py            # measure, compare with baseline
+    python benchmark_startup.py --save     # measure and store as the baseline
+
+Each run starts a fresh interpreter, imports main and builds WeatherApp
+against a headless page; the "first frame" is the moment build_ui hands
+its control tree to page.add(). Exits with status 1 if the median
+time-to-first-frame regresses more than TOLERANCE against the baseline.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 7
+TOLERANCE = 0.20  # fail on >20% slower than baseline
+BASELINE_FILE = "startup_baseline.json"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class HeadlessPage:
+    """Just enough of ft.Page to build the UI without a Flet client."""
+
+    def __init__(self, loop):
+        from types import SimpleNamespace
+
+        self.loop = loop
+        self.window = SimpleNamespace(center=lambda: None)
+        self.first_frame = None
+
+    def add(self, *controls):
+        self.first_frame = time.monotonic()
+
+    def update(self, *controls):
+        pass
+
+    def run_task(self, handler, *args):
+        pass  # post-first-frame work is not part of what we measure
+
+
+def child():
+    """Measure one startup inside this (fresh) interpreter."""
+    import asyncio
+
+    import_start = time.monotonic()
+    import main
+
+    imported = time.monotonic()
+    page = HeadlessPage(asyncio.new_event_loop())
+    main.WeatherApp(page)
+    print(json.dumps({
+        "import_start": import_start,
+        "imported": imported,
+        "first_frame": page.first_frame,
+    }))
+
+
+def measure_once() -> dict:
+    spawned = time.monotonic()
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    ).stdout
+    # CLOCK_MONOTONIC is shared between processes, so child stamps line up
+    stamps = json.loads(out.strip().splitlines()[-1])
+    return {
+        "interpreter_ms": (stamps["import_start"] - spawned) * 1000,
+        "import_main_ms": (stamps["imported"] - stamps["import_start"]) * 1000,
+        "build_ui_ms": (stamps["first_frame"] - stamps["imported"]) * 1000,
+        "first_frame_ms": (stamps["first_frame"] - spawned) * 1000,
+    }
+
+
+def slowest_imports(limit: int = 10) -> list:
+    """Top modules by cumulative import time, from `python -X importtime`."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def main():
+    if "--child" in sys.argv:
+        child()
+        return
+
+    measure_once()  # warm the OS file cache
+    runs = [measure_once() for _ in range(RUNS)]
+    result = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+
+    print(f"Median of {RUNS} cold starts")
+    for key, value in result.items():
+        print(f"  {key:<16} {value:8.1f} ms")
+
+    print("\nSlowest imports (cumulative)")
+    for cumulative_us, self_us, module in slowest_imports():
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    baseline_path = os.path.join(HERE, BASELINE_FILE)
+    if "--save" in sys.argv:
+        with open(baseline_path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nBaseline saved to {BASELINE_FILE}")
+        return
+
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        change = result["first_frame_ms"] / baseline["first_frame_ms"] - 1
+        print(f"\nTime-to-first-frame vs baseline: {change:+.1%}")
+        if change > TOLERANCE:
+            print("Startup regression!")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmark_units.py
+"""Compare the old per-reading conversion loop against units.py.
+
+Run with:
+    python benchmark_units.py [rows]
+
+Converts `rows` temperatures and wind speeds from metric to imperial, the
+way a long forecast or history set would be converted for display.
+"""
+
+import random
+import sys
+import timeit
+from array import array
+
+import units
+from units import convert_speed, convert_temperature
+
+
+def scalar_loop(temps, winds):
+    """What display_weather did, one reading at a time."""
+    out_temps, out_winds = [], []
+    for temp, wind in zip(temps, winds):
+        out_temps.append((temp * 9/5) + 32)
+        out_winds.append(wind / 0.44704)
+    return out_temps, out_winds
+
+
+def per_item(temps, winds):
+    """units.py called once per value."""
+    return (
+        [convert_temperature(t, "metric", "imperial") for t in temps],
+        [convert_speed(w, "metric", "imperial") for w in winds],
+    )
+
+
+def batch(temps, winds):
+    """units.py called once per column."""
+    return (
+        convert_temperature(temps, "metric", "imperial"),
+        convert_speed(winds, "metric", "imperial"),
+    )
+
+
+def best_of(func, *args, repeat: int = 5) -> float:
+    """Fastest of `repeat` timed runs, in milliseconds."""
+    timer = timeit.Timer(lambda: func(*args))
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=loops)) / loops * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rng = random.Random(0)
+    temps = [rng.uniform(-30, 45) for _ in range(rows)]
+    winds = [rng.uniform(0, 30) for _ in range(rows)]
+    temp_column, wind_column = array("d", temps), array("d", winds)
+
+    # Sanity check: every path agrees with the scalar formula
+    expected = scalar_loop(temps, winds)
+    for got in (per_item(temps, winds), batch(temps, winds), batch(temp_column, wind_column)):
+        assert all(abs(a - b) < 1e-9 for a, b in zip(expected[0], got[0]))
+        assert all(abs(a - b) < 1e-9 for a, b in zip(expected[1], got[1]))
+
+    cases = [
+        ("scalar loop (old)", scalar_loop, temps, winds),
+        ("units, per item", per_item, temps, winds),
+        ("units, list batch", batch, temps, winds),
+        ("units, array batch", batch, temp_column, wind_column),
+    ]
+    if units.np is not None:
+        np = units.np
+        cases.append(("units, ndarray batch", batch, np.array(temps), np.array(winds)))
+    else:
+        print("NumPy not installed: array batches use the Python fallback\n")
+
+    print(f"Converting {rows} temperatures + wind speeds, metric -> imperial\n")
+    baseline = None
+    for label, func, *args in cases:
+        ms = best_of(func, *args)
+        baseline = baseline or ms
+        print(f"  {label:<22} {ms:9.3f} ms   {baseline / ms:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,149 @@
+import atexit
 import json
 import os
+import sqlite3
+import threading
 import time
 
-CACHE_FILE = "weather_cache.json"
+CACHE_FILE = "weather_cache.db"
 CACHE_EXPIRY_MINUTES = 10  # adjust freely
+STALE_RETENTION_MINUTES = 7 * 24 * 60  # expired rows kept for stale/offline serving
+COMPACT_INTERVAL_SECONDS = 300  # how often the background sweep runs
 
-def save_cache(data):
-    cache = {
-        "timestamp": time.time(),
-        "data": data
-    }
-    with open(CACHE_FILE, "w") as f:
-        json.dump(cache, f)
 
+def _encode_key(key):
+    # tuple keys from memory_cache.make_key are stored as their JSON form
+    if isinstance(key, str):
+        return key
+    return json.dumps(list(key), separators=(",", ":"))
 
-def load_cache():
-    if not os.path.exists(CACHE_FILE):
-        return None
-    
-    with open(CACHE_FILE, "r") as f:
-        cache = json.load(f)
 
-    # expiration check
-    age_minutes = (time.time() - cache["timestamp"]) / 60
-    if age_minutes > CACHE_EXPIRY_MINUTES:
-        return None
-    
-    return cache
+class CacheStore:
+    """Keyed on-disk weather cache backed by SQLite.
+
+    Each entry carries its own timestamp and TTL. Lookups go through the
+    primary-key index, so loading one city never parses the others, and every
+    write is its own transaction, so a crash mid-save can't corrupt the file.
+    """
+
+    def __init__(self, path=CACHE_FILE, retention=STALE_RETENTION_MINUTES * 60):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                timestamp REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                data TEXT NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+        self._compactor = None
+        self._stop = threading.Event()
+
+    def set(self, key, data, ttl=None):
+        if ttl is None:
+            ttl = CACHE_EXPIRY_MINUTES * 60
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, timestamp, expires_at, data) "
+                "VALUES (?, ?, ?, ?)",
+                (_encode_key(key), now, now + ttl, json.dumps(data)),
+            )
+
+    def get(self, key, max_stale=0):
+        # max_stale: also return rows expired up to this many seconds ago
+        # (None = any age), flagged with "stale": True
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT timestamp, expires_at, data FROM cache WHERE key = ?",
+                (_encode_key(key),),
+            ).fetchone()
+        if row is None:
+            return None
+
+        timestamp, expires_at, data = row
+        now = time.time()
+        if max_stale is not None and now > expires_at + max_stale:
+            # lazy expiry; the row itself is removed by compact()
+            return None
+
+        return {
+            "timestamp": timestamp,
+            "data": json.loads(data),
+            "stale": now > expires_at,
+        }
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (_encode_key(key),))
+
+    def compact(self):
+        """Delete rows past their stale retention and fold the WAL back into the main file."""
+        with self._lock:
+            if self._stop.is_set():
+                return 0  # store already closed
+            with self._conn:
+                removed = self._conn.execute(
+                    "DELETE FROM cache WHERE expires_at < ?",
+                    (time.time() - self.retention,),
+                ).rowcount
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    def start_compaction(self, interval=COMPACT_INTERVAL_SECONDS):
+        """Run compact() every `interval` seconds on a daemon thread."""
+        if self._compactor is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.compact()
+
+        self._compactor = threading.Thread(target=loop, name="cache-compactor", daemon=True)
+        self._compactor.start()
 
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
 
-def cache_available():
-    return os.path.exists(CACHE_FILE)
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+
+
+def get_store():
+    # One store per process, shared by every app session; it stays open
+    # until the interpreter exits, so one session closing can't break the rest
+    global _store
+    if _store is None:
+        _store = CacheStore()
+        atexit.register(_store.close)
+    return _store
+
+
+def save_cache(key, data, ttl=None):
+    get_store().set(key, data, ttl)
+
+
+def load_cache(key, max_stale=0):
+    return get_store().get(key, max_stale)
+
+
+def cache_available(key=None):
+    if not os.path.exists(CACHE_FILE):
+        return False
+    if key is None:
+        return True
+    return load_cache(key) is not None
@@ -0,0 +1,172 @@
+# city_index.py
+"""Prefix index over city names for search-as-you-type suggestions.
+
+The bundled cities.tsv only covers major cities. For the full ~200k-name
+list, download GeoNames' cities500 dump and point Config.CITY_LIST_FILE
+(or the CITY_LIST_FILE environment variable) at it:
+
+    python city_index.py --download
+"""
+
+import heapq
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from textnorm import normalize
+
+BUNDLED_CITY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cities.tsv")
+GEONAMES_URL = "https://download.geonames.org/export/dump/cities500.zip"
+
+SCAN_LIMIT = 256  # prefixes matching more names than this use a precomputed top list
+TOP_K = 32        # names kept per precomputed prefix
+
+
+def read_city_file(path: str) -> Iterable[Tuple[str, int]]:
+    """
+    Yield (display name, population) from a city list.
+
+    Understands the bundled "name<TAB>country<TAB>population" format and
+    GeoNames dump files (cities500.txt, cities15000.txt, ...).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) >= 15:
+                # GeoNames: 1 = name, 8 = country code, 14 = population
+                name, country, population = fields[1], fields[8], fields[14]
+            elif len(fields) == 3:
+                name, country, population = fields
+            else:
+                continue
+            try:
+                yield f"{name}, {country}", int(population or 0)
+            except ValueError:
+                continue  # header or malformed row
+
+
+class CityIndex:
+    """Sorted array of normalized names, searched with bisect.
+
+    All names sharing a prefix form one contiguous slice, so a lookup is two
+    binary searches plus ranking the slice by population. For very common
+    prefixes ("s", "san") the ranked top TOP_K is precomputed at build time,
+    which keeps every lookup well under a millisecond even with ~200k names.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int]]):
+        # Keep the most populous entry when a name appears more than once
+        best: Dict[str, Tuple[str, int]] = {}
+        for name, population in entries:
+            key = normalize(name)
+            if key not in best or population > best[key][1]:
+                best[key] = (name, population)
+
+        self._keys = sorted(best)
+        self._names = [best[key][0] for key in self._keys]
+        self._population = array("q", (best[key][1] for key in self._keys))
+        self._top: Dict[str, List[int]] = {}
+        self._precompute_top()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _precompute_top(self):
+        keys = self._keys
+        by_population = self._population.__getitem__
+        ranges = [(0, len(keys))]
+        depth = 0
+        # Walk prefixes level by level, only descending into slices that are
+        # still too large to rank on the fly; each level is O(n log TOP_K)
+        while ranges:
+            next_ranges = []
+            for lo, hi in ranges:
+                i = lo
+                while i < hi:
+                    if len(keys[i]) <= depth:
+                        i += 1
+                        continue
+                    prefix = keys[i][:depth + 1]
+                    j = bisect_left(keys, prefix + "\uffff", i, hi)
+                    if j - i > SCAN_LIMIT:
+                        self._top[prefix] = heapq.nlargest(TOP_K, range(i, j), key=by_population)
+                        next_ranges.append((i, j))
+                    i = j
+            ranges = next_ranges
+            depth += 1
+
+    def search(
+        self,
+        text: str,
+        limit: int = 8,
+        preferred: Sequence[str] = (),
+    ) -> List[str]:
+        """
+        Return up to `limit` city names starting with `text`.
+
+        Args:
+            text: What the user has typed so far
+            limit: Maximum number of suggestions
+            preferred: Matching cities to list first, in order (e.g. from
+                search history); the rest follow by population
+
+        Returns:
+            Display names, best match first
+        """
+        key = normalize(text)
+        if not key:
+            return []
+
+        results = list(preferred[:limit])
+        seen = {normalize(city) for city in results}
+
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + "\uffff", lo)
+        if hi - lo > SCAN_LIMIT:
+            candidates = self._top[key]
+        else:
+            candidates = heapq.nlargest(
+                limit + len(results), range(lo, hi), key=self._population.__getitem__
+            )
+
+        for i in candidates:
+            if len(results) >= limit:
+                break
+            key = self._keys[i]
+            if key in seen:
+                continue
+            # History holds what was typed ("London"); treat it as the most
+            # populous match ("London, GB") but still offer "London, CA"
+            city = key.split(",")[0]
+            if city in seen:
+                seen.discard(city)
+                continue
+            results.append(self._names[i])
+        return results
+
+
+def load_city_index(path: str = "") -> CityIndex:
+    """Build an index from `path`, or from the bundled list if it's missing."""
+    if not path or not os.path.exists(path):
+        path = BUNDLED_CITY_FILE
+    return CityIndex(read_city_file(path))
+
+
+def download_city_list(dest: str = "cities500.txt"):
+    """Download GeoNames' list of every city with 500+ people (~200k names)."""
+    import io
+    import zipfile
+    from urllib.request import urlopen
+
+    with urlopen(GEONAMES_URL) as response:
+        archive = zipfile.ZipFile(io.BytesIO(response.read()))
+    with archive.open("cities500.txt") as src, open(dest, "wb") as out:
+        out.write(src.read())
+    print(f"Saved {dest}; set CITY_LIST_FILE={dest} to use it")
+
+
+if __name__ == "__main__":
+    if "--download" in sys.argv:
+        download_city_list()
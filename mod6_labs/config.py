@@ -2,20 +2,14 @@
 """Configuration management for the Weather App."""
 
 import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 class Config:
     """Application configuration."""
     
-    # API Configuration
-    API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
-    BASE_URL = os.getenv(
-        "OPENWEATHER_BASE_URL", 
-        "https://api.openweathermap.org/data/2.5/weather"
-    )
+    # API Configuration (filled in from .env / the environment by load())
+    API_KEY = ""
+    BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+    FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
     
     # App Configuration
     APP_TITLE = "Weather App"
@@ -25,16 +19,79 @@ class Config:
     # API Settings
     UNITS = "metric"  # metric, imperial, or standard
     TIMEOUT = 10  # seconds
+    CONNECT_TIMEOUT = 3  # seconds; short so a dead network is detected quickly
+    OFFLINE_RECHECK_INTERVAL = 10  # seconds between connectivity probes while offline
+
+    # Connection Pool Settings
+    MAX_CONNECTIONS = 20            # total connections the shared client may open
+    MAX_KEEPALIVE_CONNECTIONS = 10  # idle connections kept open for reuse
+    KEEPALIVE_EXPIRY = 30           # seconds before an idle connection is dropped
+
+    # In-memory Cache Settings
+    CACHE_TTL = 600                 # seconds a cached reading stays fresh
+    CACHE_MAX_ENTRIES = 256         # least recently used readings evicted past this
+    CACHE_COORD_PRECISION = 2       # decimal places lat/lon are rounded to in keys
+    STALE_WHILE_REVALIDATE = True   # show expired readings while refreshing
+    MAX_STALE = 3600                # seconds past expiry a reading may still be shown
+
+    # Retry / Circuit Breaker Settings
+    MAX_RETRIES = 2                 # extra attempts after a timeout, 5xx or 429
+    RETRY_BACKOFF_BASE = 0.5        # seconds; doubles each attempt (with jitter)
+    RETRY_BACKOFF_MAX = 8           # cap on any single wait, incl. Retry-After
+    CIRCUIT_FAILURE_THRESHOLD = 5   # consecutive failed lookups before failing fast
+    CIRCUIT_COOLDOWN = 30           # seconds to fail fast before a trial request
+
+    # Rate Limit Settings (OpenWeatherMap free tier allows 60 calls/minute)
+    RATE_LIMIT_PER_MINUTE = 60      # 0 disables client-side throttling
+    RATE_LIMIT_BURST = 10           # calls allowed back-to-back before throttling
+    RATE_LIMIT_MAX_WAIT = 30        # seconds a call may queue before failing
+
+    # History Settings
+    HISTORY_FLUSH_INTERVAL_MS = 500 # history is written to disk at most this often
+    HISTORY_MAX_ENTRIES = 50_000    # least recently searched cities dropped past this
+    HISTORY_HALF_LIFE_DAYS = 14     # a search counts half as much after this long
+
+    # Icon Cache Settings
+    ICON_CACHE_DIR = "icon_cache"   # downloaded weather icons are kept here
+
+    # Autocomplete Settings
+    CITY_LIST_FILE = ""             # GeoNames cities*.txt; bundled cities.tsv if unset
+    AUTOCOMPLETE_MIN_CHARS = 2      # characters typed before suggestions appear
+    AUTOCOMPLETE_DEBOUNCE_MS = 150  # pause in typing before the index is queried
+
+    # Metrics Settings
+    METRICS_FILE = ""               # dump metrics here on exit (.prom/.txt = Prometheus); "" = off
+
+    # Batch Fetch Settings
+    BATCH_CONCURRENCY = 10          # simultaneous requests in get_weather_many
+    
+    _loaded = False
+    
+    @classmethod
+    def load(cls):
+        """Load environment variables from .env (once).
+        
+        Deferred until the first network request so importing config costs
+        nothing at startup.
+        """
+        if cls._loaded:
+            return
+        from dotenv import load_dotenv
+        load_dotenv()
+        cls.API_KEY = os.getenv("OPENWEATHER_API_KEY", cls.API_KEY)
+        cls.BASE_URL = os.getenv("OPENWEATHER_BASE_URL", cls.BASE_URL)
+        cls.FORECAST_URL = os.getenv("OPENWEATHER_FORECAST_URL", cls.FORECAST_URL)
+        cls.CITY_LIST_FILE = os.getenv("CITY_LIST_FILE", cls.CITY_LIST_FILE)
+        cls.METRICS_FILE = os.getenv("WEATHER_METRICS_FILE", cls.METRICS_FILE)
+        cls._loaded = True
     
     @classmethod
     def validate(cls):
         """Validate that required configuration is present."""
+        cls.load()
         if not cls.API_KEY:
             raise ValueError(
                 "OPENWEATHER_API_KEY not found. "
                 "Please create a .env file with your API key."
             )
         return True
-
-# Validate configuration on import
-Config.validate()
\ No newline at end of file
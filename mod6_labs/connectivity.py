@@ -0,0 +1,48 @@
+# connectivity.py
+"""Cached network connectivity state."""
+
+import time
+from typing import Callable, List
+
+
+class Connectivity:
+    """Remembers whether the network was last seen up or down.
+
+    After a connection failure, callers are told not to attempt requests
+    for `recheck_after` seconds, so lookups fail fast instead of each
+    waiting out a connect timeout. Listeners are called when the network
+    is seen again.
+    """
+
+    def __init__(self, recheck_after: float = 10, clock=time.monotonic):
+        self.recheck_after = recheck_after
+        self._clock = clock
+        self.online = True
+        self._checked_at = 0.0
+        self._listeners: List[Callable[[], None]] = []
+
+    def should_attempt(self) -> bool:
+        """Return True if a request is worth trying now."""
+        if self.online:
+            return True
+        now = self._clock()
+        if now - self._checked_at >= self.recheck_after:
+            # Let this request act as the probe; others keep failing fast
+            self._checked_at = now
+            return True
+        return False
+
+    def mark_offline(self):
+        self.online = False
+        self._checked_at = self._clock()
+
+    def mark_online(self):
+        if self.online:
+            return
+        self.online = True
+        for listener in list(self._listeners):
+            listener()
+
+    def add_listener(self, callback: Callable[[], None]):
+        """Call `callback()` each time connectivity comes back."""
+        self._listeners.append(callback)
@@ -0,0 +1,35 @@
+# fileio.py
+"""Crash-safe file writes."""
+
+import json
+import os
+import tempfile
+
+
+def write_bytes_atomic(path: str, data: bytes):
+    """
+    Write `data` to `path` so readers only ever see the old or the new file.
+
+    The data goes to a temp file in the same directory, is fsynced, and then
+    renamed over the target; a crash mid-write leaves the old file intact.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data):
+    """Atomically write `data` as compact UTF-8 JSON."""
+    text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    write_bytes_atomic(path, text.encode("utf-8"))
@@ -0,0 +1,293 @@
+# forecast.py
+"""Columnar 5-day/3-hour forecast and an incremental parser for it."""
+
+import codecs
+import json
+import sys
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from units import convert_speed, convert_temperature
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; columns stay plain arrays
+    np = None
+
+# Numeric fields of each timestep, stored one array("d") per field
+NUMERIC_FIELDS = (
+    "time",         # unix timestamp (UTC)
+    "temp",
+    "feels_like",
+    "temp_min",
+    "temp_max",
+    "pressure",     # hPa
+    "humidity",     # %
+    "wind_speed",
+    "pop",          # probability of precipitation, 0..1
+)
+TEMPERATURE_FIELDS = ("temp", "feels_like", "temp_min", "temp_max")
+
+
+class DailyRange(NamedTuple):
+    """Lowest and highest temperature forecast for one local calendar day."""
+    day: date
+    low: float
+    high: float
+
+
+class Forecast:
+    """A forecast stored column by column.
+
+    Each numeric field is one contiguous array("d") holding a value per
+    3-hour timestep, rather than a dict per timestep. column() exposes a
+    field as a NumPy array without copying when NumPy is installed, so
+    charts, unit conversion and aggregation work on whole columns at once.
+    """
+
+    def __init__(self, city: str = "", country: str = "", tz_offset: int = 0, units: str = "metric"):
+        self.city = city
+        self.country = country
+        self.tz_offset = tz_offset    # seconds east of UTC, for local days
+        self.units = units            # units the values were requested in
+        for field in NUMERIC_FIELDS:
+            setattr(self, field, array("d"))
+        # Icon codes and descriptions repeat a lot; interning shares them
+        self.icon: List[str] = []
+        self.description: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def append(self, item: Dict):
+        """Add one entry of the API's "list" array as a new timestep."""
+        main = item.get("main", {})
+        weather = (item.get("weather") or [{}])[0]
+        self.time.append(item.get("dt", 0))
+        self.temp.append(main.get("temp", 0))
+        self.feels_like.append(main.get("feels_like", 0))
+        self.temp_min.append(main.get("temp_min", main.get("temp", 0)))
+        self.temp_max.append(main.get("temp_max", main.get("temp", 0)))
+        self.pressure.append(main.get("pressure", 0))
+        self.humidity.append(main.get("humidity", 0))
+        self.wind_speed.append(item.get("wind", {}).get("speed", 0))
+        self.pop.append(item.get("pop", 0))
+        self.icon.append(sys.intern(weather.get("icon", "01d")))
+        self.description.append(sys.intern(weather.get("description", "")))
+
+    def set_city(self, city: Dict):
+        """Take name, country and UTC offset from the response's "city" object."""
+        self.city = city.get("name", self.city)
+        self.country = city.get("country", self.country)
+        self.tz_offset = city.get("timezone", self.tz_offset)
+
+    def to_units(self, units: str) -> "Forecast":
+        """
+        A copy of this forecast with temperatures and wind speed in `units`.
+
+        Each affected column is converted in one vectorized pass.
+        """
+        converted = Forecast(self.city, self.country, self.tz_offset, units)
+        for field in NUMERIC_FIELDS:
+            values = getattr(self, field)
+            if field in TEMPERATURE_FIELDS:
+                values = convert_temperature(values, self.units, units)
+            elif field == "wind_speed":
+                values = convert_speed(values, self.units, units)
+            # Unconverted columns come back as-is; copy so the two don't share
+            setattr(converted, field, values[:] if values is getattr(self, field) else values)
+        converted.icon = list(self.icon)
+        converted.description = list(self.description)
+        return converted
+
+    def column(self, field: str):
+        """
+        One numeric field for every timestep.
+
+        Returns:
+            A read-only NumPy view of the column if NumPy is installed,
+            otherwise the array("d") itself
+        """
+        values = getattr(self, field)
+        if np is None:
+            return values
+        view = np.frombuffer(values, dtype=np.float64) if len(values) else np.empty(0)
+        view.flags.writeable = False
+        return view
+
+    def local_times(self) -> List[datetime]:
+        """Timestep start times in the city's local time zone."""
+        tz = timezone(timedelta(seconds=self.tz_offset))
+        return [datetime.fromtimestamp(t, tz) for t in self.time]
+
+    def daily_min_max(self) -> List[DailyRange]:
+        """Lowest and highest temperature for each local calendar day."""
+        if not len(self):
+            return []
+
+        # Day number since the epoch, counted in the city's local time
+        if np is not None:
+            days = (self.column("time") + self.tz_offset) // 86400
+            # Timesteps are in time order, so each day is one contiguous run
+            starts = np.flatnonzero(np.diff(days)) + 1
+            starts = np.concatenate(([0], starts))
+            lows = np.minimum.reduceat(self.column("temp_min"), starts)
+            highs = np.maximum.reduceat(self.column("temp_max"), starts)
+            first = days[starts].tolist()
+            lows, highs = lows.tolist(), highs.tolist()
+        else:
+            day_of = [int((t + self.tz_offset) // 86400) for t in self.time]
+            starts = [0] + [i for i in range(1, len(day_of)) if day_of[i] != day_of[i - 1]]
+            ends = starts[1:] + [len(day_of)]
+            first = [day_of[i] for i in starts]
+            lows = [min(self.temp_min[s:e]) for s, e in zip(starts, ends)]
+            highs = [max(self.temp_max[s:e]) for s, e in zip(starts, ends)]
+
+        epoch = date(1970, 1, 1)
+        return [
+            DailyRange(epoch + timedelta(days=int(day)), low, high)
+            for day, low, high in zip(first, lows, highs)
+        ]
+
+
+# Parser states
+_START, _KEY, _COLON, _VALUE, _AFTER_VALUE, _LIST_START, _LIST_ITEM, _LIST_AFTER, _DONE = range(9)
+_WHITESPACE = " \t\n\r"
+
+
+class ForecastParser:
+    """Incremental parser for a forecast response body.
+
+    feed() takes bytes as they arrive from the network. The top-level
+    object is walked by hand; each entry of its "list" array is decoded on
+    its own with JSONDecoder.raw_decode, appended to the Forecast's columns
+    and dropped, so the full nested payload never exists in memory. Other
+    top-level values ("city", "cnt", ...) are kept in `fields`.
+
+    Usage:
+        parser = ForecastParser(units="metric")
+        async for chunk in response.aiter_bytes():
+            parser.feed(chunk)
+        forecast = parser.close()
+    """
+
+    def __init__(self, units: str = "metric"):
+        self.forecast = Forecast(units=units)
+        self.fields: Dict = {}
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._state = _START
+        self._key: Optional[str] = None
+
+    def feed(self, chunk: bytes):
+        """Parse as much of the body as has arrived."""
+        self._buf += self._utf8.decode(chunk)
+        self._parse(final=False)
+        # Drop what has been consumed so the buffer stays about one item long
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+
+    def close(self) -> Forecast:
+        """
+        Finish parsing and return the forecast.
+
+        Raises:
+            ValueError: If the body was malformed or cut short
+        """
+        self._buf += self._utf8.decode(b"", final=True)
+        self._parse(final=True)
+        if self._state != _DONE:
+            raise ValueError("Forecast response ended unexpectedly")
+        self.forecast.set_city(self.fields.get("city") or {})
+        return self.forecast
+
+    def _decode(self, final: bool):
+        """Decode one complete JSON value at the cursor, or None if incomplete."""
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        # A number at the very end of the buffer may still be growing ("12" of "125")
+        if end == len(self._buf) and not final:
+            return None
+        self._pos = end
+        return (value,)
+
+    def _error(self, expected: str):
+        raise ValueError(f"Malformed forecast response: expected {expected} at {self._pos}")
+
+    def _parse(self, final: bool):
+        buf = self._buf
+        while True:
+            while self._pos < len(buf) and buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos == len(buf):
+                return
+            c = buf[self._pos]
+            state = self._state
+
+            if state == _START:
+                if c != "{":
+                    self._error("'{'")
+                self._pos += 1
+                self._state = _KEY
+            elif state == _KEY:
+                if c == "}":
+                    self._pos += 1
+                    self._state = _DONE
+                    continue
+                if c != '"':
+                    self._error("a key")
+                decoded = self._decode(final)
+                if decoded is None:
+                    return
+                self._key = decoded[0]
+                self._state = _COLON
+            elif state == _COLON:
+                if c != ":":
+                    self._error("':'")
+                self._pos += 1
+                self._state = _VALUE
+            elif state == _VALUE:
+                if self._key == "list" and c == "[":
+                    self._pos += 1
+                    self._state = _LIST_START
+                    continue
+                decoded = self._decode(final)
+                if decoded is None:
+                    return
+                self.fields[self._key] = decoded[0]
+                self._state = _AFTER_VALUE
+            elif state == _AFTER_VALUE:
+                if c == ",":
+                    self._state = _KEY
+                elif c == "}":
+                    self._state = _DONE
+                else:
+                    self._error("',' or '}'")
+                self._pos += 1
+            elif state in (_LIST_START, _LIST_ITEM):
+                if c == "]" and state == _LIST_START:
+                    self._pos += 1
+                    self._state = _AFTER_VALUE
+                    continue
+                decoded = self._decode(final)
+                if decoded is None:
+                    return
+                self.forecast.append(decoded[0])
+                self._state = _LIST_AFTER
+            elif state == _LIST_AFTER:
+                if c == ",":
+                    self._state = _LIST_ITEM
+                elif c == "]":
+                    self._state = _AFTER_VALUE
+                else:
+                    self._error("',' or ']'")
+                self._pos += 1
+            else:
+                self._error("end of input")
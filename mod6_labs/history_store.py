@@ -0,0 +1,313 @@
+# history_store.py
+"""Search history: frecency-ranked store and its persistence."""
+
+import asyncio
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, List, Optional, Tuple, Union
+
+from fileio import write_json_atomic
+from textnorm import normalize
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2
+TOP_CACHE = 32  # size of the incrementally maintained frecency ranking
+
+
+class HistoryEntry:
+    """Hit count, last search time and decayed visit score for one city."""
+
+    __slots__ = ("count", "last_seen", "score")
+
+    def __init__(self, count: int, last_seen: float, score: float):
+        self.count = count
+        self.last_seen = last_seen
+        self.score = score
+
+
+class HistoryStore:
+    """Search history ranked by frecency (frequency decayed by recency).
+
+    Entries live in an OrderedDict kept in recency order, so recording a
+    search is an O(1) move-to-end and the least recently used city is
+    evicted past `max_entries`. Each visit adds 1 to a score that halves
+    every `half_life` seconds. A sorted list of normalized names backs
+    prefix search. Methods take a lock: searches are recorded from Flet's
+    handler threads while the writer snapshots on the event loop.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 50_000,
+        half_life: float = 14 * 24 * 3600,
+        clock=time.time,
+    ):
+        self.max_entries = max_entries
+        self.half_life = half_life
+        self._clock = clock
+        self._entries: "OrderedDict[str, HistoryEntry]" = OrderedDict()  # oldest first
+        self._keys: List[Tuple[str, str]] = []  # sorted (normalized name, city)
+        self._top: Optional[List[str]] = None   # cached best TOP_CACHE cities
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, city: str) -> bool:
+        with self._lock:
+            return city in self._entries
+
+    def get(self, city: str) -> Optional[HistoryEntry]:
+        with self._lock:
+            return self._entries.get(city)
+
+    def _rank(self, city: str) -> float:
+        # log2 of the score decayed back to time 0. Decaying every score to
+        # "now" scales them all by the same factor, so ranking on this key
+        # gives the same order at any time without recomputing anything.
+        entry = self._entries[city]
+        return math.log2(max(entry.score, 1e-12)) + entry.last_seen / self.half_life
+
+    def touch(self, city: str, now: Optional[float] = None, hits: int = 1):
+        """Record `hits` searches for `city` at time `now` (default: the clock)."""
+        now = self._clock() if now is None else now
+        with self._lock:
+            entry = self._entries.get(city)
+            if entry is None:
+                entry = self._entries[city] = HistoryEntry(0, now, 0.0)
+                insort(self._keys, (normalize(city), city))
+            else:
+                self._entries.move_to_end(city)
+            elapsed = max(0.0, now - entry.last_seen)
+            entry.score = entry.score * 0.5 ** (elapsed / self.half_life) + hits
+            entry.count += hits
+            entry.last_seen = max(entry.last_seen, now)
+            if len(self._entries) > self.max_entries:
+                self._evict_oldest()
+            self._promote(city)
+
+    def _promote(self, city: str):
+        # A visit only ever raises a city's rank and no other rank changes,
+        # so the cached top list is fixed up by re-placing just this city
+        if self._top is None or city not in self._entries:
+            return
+        if city not in self._top:
+            self._top.append(city)
+        self._top.sort(key=self._rank, reverse=True)
+        del self._top[TOP_CACHE:]
+
+    def _evict_oldest(self):
+        city, _ = self._entries.popitem(last=False)
+        i = bisect_left(self._keys, (normalize(city), city))
+        del self._keys[i]
+        if self._top is not None and city in self._top:
+            self._top = None  # recompute on next top()
+
+    def remove(self, city: str):
+        """Forget `city`."""
+        with self._lock:
+            if self._entries.pop(city, None) is None:
+                return
+            i = bisect_left(self._keys, (normalize(city), city))
+            del self._keys[i]
+            self._top = None
+
+    def recent(self, n: int) -> List[str]:
+        """The `n` most recently searched cities, newest first."""
+        with self._lock:
+            return list(islice(reversed(self._entries), n))
+
+    def top(self, n: int) -> List[str]:
+        """The `n` cities with the highest frecency, best first."""
+        with self._lock:
+            if n > TOP_CACHE:
+                return heapq.nlargest(n, self._entries, key=self._rank)
+            if self._top is None:
+                self._top = heapq.nlargest(TOP_CACHE, self._entries, key=self._rank)
+            return self._top[:n]
+
+    def search(self, prefix: str, limit: int) -> List[str]:
+        """Previously searched cities starting with `prefix`, best first."""
+        key = normalize(prefix)
+        with self._lock:
+            lo = bisect_left(self._keys, (key,))
+            hi = bisect_left(self._keys, (key + "\uffff",), lo)
+            cities = (city for _, city in self._keys[lo:hi])
+            return heapq.nlargest(limit, cities, key=self._rank)
+
+    def merge(self, other: "HistoryStore"):
+        """Fold `other`'s entries into this store, oldest first."""
+        with other._lock:
+            entries = [(city, e.count, e.last_seen, e.score) for city, e in other._entries.items()]
+        with self._lock:
+            for city, count, last_seen, score in entries:
+                mine = self._entries.get(city)
+                if mine is None:
+                    self._add(city, count, last_seen, score)
+                    continue
+                # Decay both scores to the later visit before adding them
+                newest = max(mine.last_seen, last_seen)
+                mine.score = (
+                    mine.score * 0.5 ** ((newest - mine.last_seen) / self.half_life)
+                    + score * 0.5 ** ((newest - last_seen) / self.half_life)
+                )
+                mine.count += count
+                mine.last_seen = newest
+                self._entries.move_to_end(city)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+            for city, *_ in entries:
+                self._promote(city)
+
+    def _add(self, city: str, count: int, last_seen: float, score: float):
+        self._entries[city] = HistoryEntry(count, last_seen, score)
+        insort(self._keys, (normalize(city), city))
+
+    def snapshot(self) -> Dict:
+        """Compact JSON-ready form: one [city, count, last_seen, score] row per entry."""
+        with self._lock:
+            rows = [
+                [city, e.count, round(e.last_seen), round(e.score, 4)]
+                for city, e in self._entries.items()
+            ]
+        return {"version": FORMAT_VERSION, "entries": rows}
+
+    @classmethod
+    def from_data(cls, data: Union[Dict, List], **kwargs) -> "HistoryStore":
+        """
+        Rebuild a store from snapshot() output.
+
+        Also accepts the legacy format, a plain list of cities newest first;
+        each becomes a single hit, a second apart so their order is kept.
+        """
+        store = cls(**kwargs)
+        if isinstance(data, list):
+            now = store._clock()
+            rows = [
+                [city, 1, now - i, 1.0]
+                for i, city in enumerate(data)
+                if isinstance(city, str)
+            ]
+            rows.reverse()
+        elif isinstance(data, dict):
+            rows = data.get("entries", [])
+        else:
+            rows = []
+
+        # Rows are oldest first; build the sorted key list in one pass
+        for row in rows[-store.max_entries:]:
+            try:
+                city, count, last_seen, score = row
+                store._entries[str(city)] = HistoryEntry(int(count), float(last_seen), float(score))
+            except (TypeError, ValueError):
+                continue  # skip a corrupt row rather than lose the history
+        store._keys = sorted((normalize(city), city) for city in store._entries)
+        store.top(TOP_CACHE)  # rank once here (usually in a thread), not on first render
+        return store
+
+
+def load_history(path: str) -> Union[Dict, List]:
+    """Read the saved history, or return [] if it is missing or unreadable."""
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+    return []
+
+
+class HistoryWriter:
+    """Debounced, coalescing history writer.
+
+    save() only records the latest snapshot; the file is written at most
+    once per `interval_ms`, in a thread executor so the UI event loop never
+    blocks on disk. Call close() on shutdown to flush anything pending.
+
+    A failed write is logged and kept in `last_error`; the next save()
+    writes the whole history again.
+    """
+
+    def __init__(self, path: str, loop: asyncio.AbstractEventLoop, interval_ms: int = 500):
+        self.path = path
+        self.interval = interval_ms / 1000
+        self._loop = loop
+        self._pending = None
+        self._pending_lock = threading.Lock()
+        self._timer = None
+        self._write_lock = None
+        self._task = None               # scheduled flush, kept so it isn't collected
+        self.writes = 0
+        self.last_error = None
+
+    def save(self, history):
+        """
+        Queue `history` for writing. Safe from any thread.
+
+        Args:
+            history: A list to write as-is, or a zero-argument callable
+                (e.g. HistoryStore.snapshot) called in the writer thread when
+                the write happens, so a burst of saves builds one snapshot
+        """
+        with self._pending_lock:
+            self._pending = history if callable(history) else list(history)
+        self._loop.call_soon_threadsafe(self._arm)
+
+    def _arm(self):
+        # Runs on the loop; later saves fold into the already-armed flush
+        if self._timer is None:
+            self._timer = self._loop.call_later(self.interval, self._fire)
+
+    def _fire(self):
+        self._timer = None
+        self._task = self._loop.create_task(self.flush())
+        self._task.add_done_callback(self._flushed)
+
+    def _flushed(self, task: asyncio.Task):
+        if self._task is task:
+            self._task = None
+        if not task.cancelled() and task.exception() is not None:
+            log.error("History flush failed", exc_info=task.exception())
+
+    async def flush(self):
+        """Write the latest pending snapshot, if any."""
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+
+        # Serialize writes so an older snapshot can never land after a newer one
+        async with self._write_lock:
+            with self._pending_lock:
+                data, self._pending = self._pending, None
+            if data is None:
+                return
+            try:
+                await self._loop.run_in_executor(None, self._write, data)
+            except OSError as e:
+                self.last_error = e
+                log.warning("Could not save history to %s: %s", self.path, e)
+                return
+            self.last_error = None
+            self.writes += 1
+
+    def _write(self, data):
+        # Runs in the executor, so even building a large snapshot stays off the loop
+        if callable(data):
+            data = data()
+        write_json_atomic(self.path, data)
+
+    async def close(self):
+        """Cancel the debounce timer and flush immediately."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
@@ -0,0 +1,95 @@
+# icon_cache.py
+"""Weather icon cache: fetch each icon once, then serve it locally."""
+
+import asyncio
+import base64
+import os
+from typing import Callable, Dict, Iterable, Optional
+
+import httpx
+from fileio import write_bytes_atomic
+from singleflight import SingleFlight
+
+ICON_URL = "https://openweathermap.org/img/wn/{code}@2x.png"
+
+# Every icon code OpenWeatherMap uses: condition group + day/night suffix
+KNOWN_ICON_CODES = [
+    f"{group}{time_of_day}"
+    for group in ("01", "02", "03", "04", "09", "10", "11", "13", "50")
+    for time_of_day in ("d", "n")
+]
+
+
+def icon_url(code: str) -> str:
+    """Remote URL of an icon, used as a fallback when it isn't cached yet."""
+    return ICON_URL.format(code=code)
+
+
+class IconCache:
+    """Icons kept as base64 in memory and as PNG files on disk.
+
+    Each code is downloaded at most once (concurrent requests for the same
+    code share one download) through the weather service's pooled client.
+    """
+
+    def __init__(self, client_getter: Callable[[], httpx.AsyncClient], directory: str):
+        self._client_getter = client_getter
+        self.directory = directory
+        self._memory: Dict[str, str] = {}
+        self._inflight = SingleFlight()
+
+    def _path(self, code: str) -> str:
+        return os.path.join(self.directory, f"{code}.png")
+
+    def cached(self, code: str) -> Optional[str]:
+        """Return the icon as base64 if it's in memory, else None (never blocks)."""
+        return self._memory.get(code)
+
+    async def get(self, code: str) -> Optional[str]:
+        """Return the icon as base64, from disk or downloaded if needed (None on failure)."""
+        encoded = self.cached(code)
+        if encoded is not None:
+            return encoded
+        try:
+            return await self._inflight.do(code, lambda: self._load(code))
+        except httpx.HTTPError:
+            return None  # caller falls back to the remote URL
+
+    def _read(self, code: str) -> Optional[bytes]:
+        try:
+            with open(self._path(code), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write(self, code: str, png: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        write_bytes_atomic(self._path(code), png)
+
+    async def _load(self, code: str) -> str:
+        # Disk I/O runs in the executor so the event loop never waits on it
+        png = await asyncio.to_thread(self._read, code)
+        if png is None:
+            response = await self._client_getter().get(icon_url(code))
+            response.raise_for_status()
+            png = response.content
+            try:
+                await asyncio.to_thread(self._write, code, png)
+            except OSError:
+                pass  # read-only or full disk: still serve it from memory
+
+        encoded = base64.b64encode(png).decode("ascii")
+        self._memory[code] = encoded
+        return encoded
+
+    async def prefetch(self, codes: Iterable[str] = KNOWN_ICON_CODES, concurrency: int = 4):
+        """Load every code into memory, downloading any not yet on disk."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(code):
+            async with semaphore:
+                await self.get(code)
+
+        # One icon failing in an unexpected way mustn't abort the others
+        # (or the startup that awaits this)
+        await asyncio.gather(*(fetch(code) for code in codes), return_exceptions=True)
@@ -2,51 +2,160 @@
 """Weather Application using Flet v0.28.3"""
 
 import flet as ft
-from weather_service import WeatherService
+from models import WeatherReading
 from config import Config
-import json
-import os
+from history_store import HistoryStore, HistoryWriter, load_history
+from metrics import Metrics, span
 import asyncio
+import logging
+
+# weather_service (httpx), cache_manager (sqlite3), icon_cache and units
+# (NumPy, if installed) are imported lazily on first use so they don't delay
+# the first frame
 
 HISTORY_FILE = "search_history.json"
-MAX_HISTORY = 8 # max search history
+MAX_HISTORY = 8 # cities shown in the search dropdown
+
+log = logging.getLogger(__name__)
+
+def preload_modules():
+    """Import the modules deferred at startup (meant to run in a thread)."""
+    import cache_manager
+    import icon_cache
+    import units
+    import weather_service
+
+
+def load_city_list():
+    """Build the autocomplete index (meant to run in a thread)."""
+    from city_index import load_city_index
+    Config.load()
+    return load_city_index(Config.CITY_LIST_FILE)
+
+
+def normalize_city(city: str) -> str:
+    """Title-case a city name, keeping a country code in capitals ("Paris, FR")."""
+    name, _, country = city.strip().partition(",")
+    name = name.strip().title()
+    country = country.strip().upper()
+    return f"{name}, {country}" if name and country else name
+
+
+def format_age(seconds: float) -> str:
+    """Human-readable age, e.g. "5 min" or "3 h"."""
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    hours = minutes // 60
+    if hours < 48:
+        return f"{hours} h"
+    return f"{hours // 24} days"
+
 
 class WeatherApp:
     """Main Weather Application class."""
     
     def __init__(self, page: ft.Page):
         self.page = page
-        self.weather_service = WeatherService()
-        self.history = self.load_history()
-        self.setup_page()
-        self.build_ui()
+        self._cache_store = None            # created on first use
+        self._weather_service = None
+        self._icon_cache = None
+        self.metrics = None                 # set with the service if Config.METRICS_FILE
+        self.history = self.new_history()   # saved history merged in after the first frame
+        self.city_index = None              # autocomplete index, built after the first frame
+        self._suggest_task = None           # pending debounced suggestion lookup
+        self.history_writer = HistoryWriter(
+            HISTORY_FILE, self.page.loop, Config.HISTORY_FLUSH_INTERVAL_MS
+        )
         self.current_unit = "metric"        # default to metric (°C, m/s)
         self.current_temp = 0               # current temperature in the active unit
         self.current_feels_like = 0
         self.current_wind_speed = 0
-        self.current_data = None            # store full weather data for reuse
+        self.current_reading = None         # last WeatherReading, reused for unit toggles
+        self.current_city = ""              # city of the search being displayed
+        self.current_stale_age = None       # age in seconds if showing a stale reading
+        self.current_offline = False        # reading shown because the network is down
+        self.current_refresh_failed = False # background refresh of a stale reading failed
+        self.setup_page()
+        self.build_ui()
+        # Everything below the first frame happens in the background
+        self.page.run_task(self.finish_startup)
+
+    async def finish_startup(self):
+        """Load history and warm up services once the first frame is shown."""
+        await self.load_history_async()
+        # Pay for the heavy imports (httpx, sqlite3) off the event loop
+        await asyncio.to_thread(preload_modules)
+        self.city_index = await asyncio.to_thread(load_city_list)
+        # Warm every weather icon so renders never wait on one
+        await self.icon_cache.prefetch()
+
+    @property
+    def cache_store(self):
+        """Persistent weather cache, opened on first use."""
+        if self._cache_store is None:
+            import cache_manager
+            self._cache_store = cache_manager.get_store()
+            self._cache_store.start_compaction()
+        return self._cache_store
+
+    @property
+    def weather_service(self):
+        """Weather service, created on first use."""
+        return self._ensure_service()
+
+    def _ensure_service(self):
+        """Create the weather service (and its metrics, if enabled) if needed."""
+        if self._weather_service is None:
+            from weather_service import WeatherService
+            service = WeatherService(store=self.cache_store, parse_readings=True)
+            service.add_refresh_listener(self.on_background_refresh)
+            Config.load()
+            if Config.METRICS_FILE:
+                self.metrics = Metrics(max_connections=Config.MAX_CONNECTIONS)
+                service.metrics = self.metrics
+            self._weather_service = service
+        return self._weather_service
+
+    @property
+    def icon_cache(self):
+        """Weather icon cache, created on first use."""
+        if self._icon_cache is None:
+            from icon_cache import IconCache
+            self._icon_cache = IconCache(lambda: self.weather_service.client, Config.ICON_CACHE_DIR)
+        return self._icon_cache
     
     # json file functions
+    def new_history(self, data=None) -> HistoryStore:
+        return HistoryStore.from_data(
+            data or [],
+            max_entries=Config.HISTORY_MAX_ENTRIES,
+            half_life=Config.HISTORY_HALF_LIFE_DAYS * 24 * 3600,
+        )
+
     def load_history(self):
-        if os.path.exists(HISTORY_FILE):
-            try:
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
-
-    def save_history(self, hist):
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(hist, f, ensure_ascii=False)
+        return self.new_history(load_history(HISTORY_FILE))
+
+    async def load_history_async(self):
+        """Read saved history off the event loop and show it."""
+        saved = await asyncio.to_thread(self.load_history)
+        # Keep anything searched while the file was loading
+        saved.merge(self.history)
+        self.history = saved
+        self.refresh_history()
+
+    def save_history(self):
+        # debounced: snapshotted and written off the event loop at most
+        # every HISTORY_FLUSH_INTERVAL_MS (a lambda, so it sees the store
+        # that replaces this one once saved history has loaded)
+        self.history_writer.save(lambda: self.history.snapshot())
 
     def add_to_history(self, city: str):
-        city = city.strip().title()
-        if not city or city in self.history:
+        city = normalize_city(city)
+        if not city:
             return
-        self.history.insert(0, city)          # newest on top
-        self.history = self.history[:10]      # keep only last 10
-        self.save_history(self.history)                 
+        self.history.touch(city)              # counts the search, moves it to front
+        self.save_history()
 
     def setup_page(self):
         """Configure page settings."""
@@ -67,9 +176,20 @@ class WeatherApp:
 
         # Center the window on desktop
         self.page.window.center()
+
+        # Flush history and release pooled HTTP connections when the session ends
+        self.page.on_close = self.on_close
+
+    async def on_close(self, e):
+        """Flush pending history and shut down the shared HTTP client."""
+        await self.history_writer.close()
+        if self._weather_service is not None:
+            await self._weather_service.aclose()
+        if self.metrics is not None:
+            await asyncio.to_thread(self.metrics.dump, Config.METRICS_FILE)
     
     def select_city(self, city: str):
-        city = city.strip().title()
+        city = normalize_city(city)
         if not city:
             return
 
@@ -77,13 +197,7 @@ class WeatherApp:
         self.city_input.value = city
         self.city_input.close_view(city)
 
-        if city in self.history:
-            self.history.remove(city)
-        self.history.insert(0, city)
-        self.history = self.history[:MAX_HISTORY]
-        self.save_history(self.history)
-        self.refresh_history()
-
+        # get_weather records the search and refreshes the dropdown
         self.page.run_task(self.get_weather)  
 
     def refresh_history(self):
@@ -94,11 +208,45 @@ class WeatherApp:
                 on_click=lambda e, c=city: self.select_city(c),
 
             )
-            for city in self.history[:MAX_HISTORY]
+            for city in self.history.top(MAX_HISTORY)
         ]
         
         self.history_column.update()
 
+    def show_suggestions(self, cities):
+        """List autocomplete matches in the search dropdown."""
+        self.history_column.controls = [
+            ft.ListTile(
+                leading=ft.Icon(ft.Icons.HISTORY if city in self.history else ft.Icons.LOCATION_CITY),
+                title=ft.Text(city),
+                on_click=lambda e, c=city: self.select_city(c),
+            )
+            for city in cities
+        ]
+        self.history_column.update()
+
+    async def on_search_change(self, e):
+        """Restart the suggestion lookup on every keystroke (debounced)."""
+        if self._suggest_task is not None:
+            self._suggest_task.cancel()
+        self._suggest_task = asyncio.create_task(self.suggest(e.control.value or ""))
+
+    async def suggest(self, text: str):
+        """Show cities starting with `text` once typing pauses."""
+        await asyncio.sleep(Config.AUTOCOMPLETE_DEBOUNCE_MS / 1000)
+        if len(text.strip()) < Config.AUTOCOMPLETE_MIN_CHARS:
+            self.refresh_history()
+            return
+        cities = await asyncio.to_thread(self.find_suggestions, text)
+        self.show_suggestions(cities)
+
+    def find_suggestions(self, text: str):
+        """Matching cities from history (by frecency), then the city list."""
+        preferred = self.history.search(text, MAX_HISTORY)
+        if self.city_index is None:
+            return preferred
+        return self.city_index.search(text, MAX_HISTORY, preferred)
+
     def build_ui(self):
         """Build the user interface."""
         # Title
@@ -120,6 +268,7 @@ class WeatherApp:
             view_hint_text="Your recent searches",
             on_tap=lambda e: self.city_input.open_view(),
             on_submit=self.on_search_async,
+            on_change=self.on_search_change,
             
             view_size_constraints=search_view_constraints, 
             
@@ -142,12 +291,15 @@ class WeatherApp:
             ),
         )
         
-        # Weather display container (initially hidden)
+        # Weather display container (initially hidden), built once and
+        # patched in place by render_reading()
         self.weather_container = ft.Container(
+            content=self.build_weather_card(),
             visible=False,
             bgcolor=ft.Colors.BLUE_50,
             border_radius=10,
             padding=20,
+            animate_opacity=300,
         )
         
         # Error message
@@ -190,15 +342,23 @@ class WeatherApp:
                 spacing=10,
             )
         )
-
-        self.refresh_history() # populate the listTile
         
     async def on_search_async(self, e):
         """Async event handler."""
         await self.get_weather()
     
     async def get_weather(self):
-        """Fetch and display weather data."""
+        """Fetch and display weather data.
+
+        With metrics on, the whole search, up to and including the final
+        page update, is timed as the "search" span, with "search.fetch" and
+        "search.render" inside it.
+        """
+        self._ensure_service()  # so self.metrics exists before the span starts
+        with span(self.metrics, "search"):
+            await self.search()
+
+    async def search(self):
         city = self.city_input.value.strip()
 
         # add city to json file
@@ -210,6 +370,22 @@ class WeatherApp:
             self.show_error("Please enter a city name")
             return
         
+        self.current_city = city
+        
+        # Serve a cached reading immediately; if it's stale, show it anyway
+        # and refresh in the background (stale-while-revalidate)
+        cached = self.weather_service.peek(city)
+        if cached is not None and (not cached.stale or Config.STALE_WHILE_REVALIDATE):
+            self.error_message.visible = False
+            with span(self.metrics, "search.render"):
+                await self.display_weather(
+                    cached.data,
+                    stale_age=cached.age if cached.stale else None,
+                )
+            if cached.stale:
+                self.page.run_task(self.revalidate, city)
+            return
+        
         # Show loading, hide previous results
         self.loading.visible = True
         self.error_message.visible = False
@@ -217,11 +393,18 @@ class WeatherApp:
         self.page.update()
         
         try:
-            # Fetch weather data
-            weather_data = await self.weather_service.get_weather(city)
+            # Fetch weather data (cache was already checked above); when the
+            # network is down this falls back to the newest cached reading
+            with span(self.metrics, "search.fetch"):
+                result = await self.weather_service.get_weather_offline_first(city)
             
             # Display weather
-            await self.display_weather(weather_data)
+            with span(self.metrics, "search.render"):
+                await self.display_weather(
+                    result.data,
+                    stale_age=result.age if result.offline else None,
+                    offline=result.offline,
+                )
             
         except Exception as e:
             self.show_error(str(e))
@@ -230,6 +413,32 @@ class WeatherApp:
             self.loading.visible = False
             self.page.update()
 
+    async def revalidate(self, city: str):
+        """Refresh a stale reading in the background and swap it in."""
+        try:
+            result = await self.weather_service.get_weather_offline_first(city)
+        except Exception:
+            # Keep showing the stale reading; the next search retries
+            log.exception("Background refresh for %s failed", city)
+            if city == self.current_city:
+                self.current_refresh_failed = True
+                self.render_reading()
+                self.weather_container.update()
+            return
+        
+        # Only replace the card if the user hasn't searched for something else
+        if city == self.current_city:
+            await self.display_weather(
+                result.data,
+                stale_age=result.age if result.offline else None,
+                offline=result.offline,
+            )
+
+    def on_background_refresh(self, city: str, reading: WeatherReading):
+        """Show a refresh replayed after reconnecting, if it's still on screen."""
+        if city == self.current_city:
+            self.page.run_task(self.display_weather, reading)
+
     # Toggle theme
     def toggle_theme(self, e):
         """Toggle between light and dark theme."""
@@ -244,60 +453,60 @@ class WeatherApp:
     # temp toggle
     def toggle_units(self, e):
         """Toggle between Celsius and Fahrenheit + update display."""
-        if not self.current_data:
+        if not self.current_reading:
             return  # no data yet
 
         # Toggle unit
         self.current_unit = "imperial" if self.current_unit == "metric" else "metric"
 
-        # Re-display weather with new units
-        self.page.run_task(self.display_weather, self.current_data)
+        # Patch only the unit-dependent text in place
+        self.render_reading()
+        self.weather_container.update()
 
-    async def display_weather(self, data: dict):
-        """Display weather information and store data for unit conversion."""
-        # Store the raw data and values
-        self.current_data = data
-        
-        city_name = data.get("name", "Unknown")
-        country = data.get("sys", {}).get("country", "")
-        temp_c = data.get("main", {}).get("temp", 0)
-        feels_like_c = data.get("main", {}).get("feels_like", 0)
-        humidity = data.get("main", {}).get("humidity", 0)
-        description = data.get("weather", [{}])[0].get("description", "").title()
-        icon_code = data.get("weather", [{}])[0].get("icon", "01d")
-        wind_speed_ms = data.get("wind", {}).get("speed", 0)
-
-        # Convert wind speed: m/s → mph when imperial
-        wind_speed = wind_speed_ms * 3.6 if self.current_unit == "imperial" else wind_speed_ms
-        wind_unit = "km/h" if self.current_unit == "imperial" else "m/s"
-
-        # Set temperature based on current unit
-        if self.current_unit == "metric":
-            temp = temp_c
-            feels_like = feels_like_c
-            temp_unit = "C"
-        else:
-            temp = (temp_c * 9/5) + 32
-            feels_like = (feels_like_c * 9/5) + 32
-            temp_unit = "F"
-
-        # Store current displayed values
-        self.current_temp = temp
-        self.current_feels_like = feels_like
-        self.current_wind_speed = wind_speed
+    def build_weather_card(self):
+        """Build the weather card once; render_reading() fills in the values."""
+        self.location_text = ft.Text(
+            "",
+            size=24,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.BLACK
+        )
+        # Stale reading marker (hidden for fresh data)
+        self.stale_text = ft.Text(
+            "",
+            size=12,
+            italic=True,
+            color=ft.Colors.ORANGE_700,
+            visible=False,
+        )
+        self.weather_icon = ft.Image(src="", width=100, height=100)
+        self.description_text = ft.Text("", size=20, italic=True, color=ft.Colors.BLACK)
+        self.temp_text = ft.Text(
+            "",
+            size=48,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.BLUE_900,
+        )
+        self.unit_button = ft.TextButton(
+            text="C",
+            on_click=self.toggle_units,
+            style=ft.ButtonStyle(
+                bgcolor=ft.Colors.BLUE_200,
+                color=ft.Colors.BLUE_900,
+                padding=ft.padding.symmetric(horizontal=12, vertical=8),
+                shape=ft.RoundedRectangleBorder(radius=20),
+            ),
+        )
+        self.feels_like_text = ft.Text("", size=16, color=ft.Colors.GREY_700)
+        self.humidity_text = self.create_info_value()
+        self.wind_text = self.create_info_value()
 
-        # Build UI
-        self.weather_container.content = ft.Column(
+        return ft.Column(
             [
                 # Location + Unit Toggle Button
                 ft.Row(
                     [
-                        ft.Text(
-                            f"{city_name}, {country}",
-                            size=24,
-                            weight=ft.FontWeight.BOLD,
-                            color=ft.Colors.BLACK
-                        ),
+                        self.location_text,
                         ft.IconButton(
                             icon=ft.Icons.THERMOSTAT,
                             tooltip="Toggle °C / °F",
@@ -311,41 +520,25 @@ class WeatherApp:
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                 ),
                 
+                self.stale_text,
+                
                 # Weather icon and description
                 ft.Row(
                     [
-                        ft.Image(
-                            src=f"https://openweathermap.org/img/wn/{icon_code}@2x.png",
-                            width=100,
-                            height=100,
-                        ),
+                        self.weather_icon,
                         ft.Column(
                             [
-                                ft.Text(description, size=20, italic=True, color=ft.Colors.BLACK),
+                                self.description_text,
                                 # Big temperature + toggle button side by side
                                 ft.Row(
                                     [
-                                        ft.Text(
-                                            f"{temp:.1f}°",
-                                            size=48,
-                                            weight=ft.FontWeight.BOLD,
-                                            color=ft.Colors.BLUE_900,
-                                        ),
-                                        ft.TextButton(
-                                            text="C" if self.current_unit == "metric" else "F",
-                                            on_click=self.toggle_units,
-                                            style=ft.ButtonStyle(
-                                                bgcolor=ft.Colors.BLUE_200,
-                                                color=ft.Colors.BLUE_900,
-                                                padding=ft.padding.symmetric(horizontal=12, vertical=8),
-                                                shape=ft.RoundedRectangleBorder(radius=20),
-                                            ),
-                                        ),
+                                        self.temp_text,
+                                        self.unit_button,
                                     ],
                                     alignment=ft.MainAxisAlignment.CENTER,
                                     spacing=0,
                                 ),
-                                ft.Text(f"Feels like {feels_like:.1f}°{temp_unit}", size=16, color=ft.Colors.GREY_700),
+                                self.feels_like_text,
                             ]
                         ),
                     ],
@@ -360,12 +553,12 @@ class WeatherApp:
                         self.create_info_card(
                             ft.Icons.WATER_DROP,
                             "Humidity",
-                            f"{humidity}%"
+                            self.humidity_text
                         ),
                         self.create_info_card(
                             ft.Icons.AIR,
                             "Wind Speed",
-                            f"{wind_speed:.1f} {wind_unit}"
+                            self.wind_text
                         ),
                     ],
                     alignment=ft.MainAxisAlignment.SPACE_EVENLY,
@@ -375,28 +568,109 @@ class WeatherApp:
             spacing=10,
         )
 
+    def render_reading(self):
+        """Write the current reading into the card's existing controls.
+
+        Only control properties change here; the caller issues one update().
+        """
+        reading = self.current_reading
+        stale_age = self.current_stale_age
+
+        from units import SPEED_SYMBOLS, TEMPERATURE_SYMBOLS, convert_speed, convert_temperature
+
+        # Readings arrive in Config.UNITS; convert to the unit picked in the UI
+        source = Config.UNITS
+        temp = convert_temperature(reading.temp, source, self.current_unit)
+        feels_like = convert_temperature(reading.feels_like, source, self.current_unit)
+        wind_speed = convert_speed(reading.wind_speed, source, self.current_unit)
+        temp_unit = TEMPERATURE_SYMBOLS[self.current_unit].lstrip("°")
+        wind_unit = SPEED_SYMBOLS[self.current_unit]
+
+        # Store current displayed values
+        self.current_temp = temp
+        self.current_feels_like = feels_like
+        self.current_wind_speed = wind_speed
+
+        self.location_text.value = f"{reading.name}, {reading.country}"
+        self.stale_text.visible = stale_age is not None
+        if self.current_offline:
+            self.stale_text.value = f"Offline · updated {format_age(stale_age)} ago"
+        elif stale_age is not None:
+            status = "couldn't refresh" if self.current_refresh_failed else "refreshing…"
+            self.stale_text.value = f"Updated {format_age(stale_age)} ago · {status}"
+        self.render_icon(reading.icon)
+        self.description_text.value = reading.description.title()
+        self.temp_text.value = f"{temp:.1f}°"
+        self.unit_button.text = temp_unit
+        self.feels_like_text.value = f"Feels like {feels_like:.1f}°{temp_unit}"
+        self.humidity_text.value = f"{reading.humidity}%"
+        self.wind_text.value = f"{wind_speed:.1f} {wind_unit}"
+
+    def render_icon(self, code: str):
+        """Point the icon image at the local copy, fetching it if needed."""
+        from icon_cache import icon_url
+        # The remote URL stays as a fallback; src_base64 takes precedence
+        self.weather_icon.src = icon_url(code)
+        self.weather_icon.src_base64 = self.icon_cache.cached(code)
+        if self.weather_icon.src_base64 is None:
+            self.page.run_task(self.load_icon, code)
+
+    async def load_icon(self, code: str):
+        """Load an icon from disk or the network and swap it in if still shown."""
+        encoded = await self.icon_cache.get(code)
+        if encoded is not None and self.current_reading and self.current_reading.icon == code:
+            self.weather_icon.src_base64 = encoded
+            self.weather_icon.update()
+
+    async def display_weather(
+        self,
+        reading: WeatherReading,
+        stale_age: float = None,
+        offline: bool = False,
+    ):
+        """Display weather information and store the reading for unit conversion.
+        
+        stale_age is set (in seconds) when showing an expired cached reading
+        while a fresh one is being fetched, or, with offline=True, the newest
+        cached reading while the network is down.
+        """
+        # Store the reading
+        self.current_reading = reading
+        self.current_stale_age = stale_age
+        self.current_offline = offline
+        self.current_refresh_failed = False
+        self.render_reading()
+
+        if self.weather_container.visible:
+            # Card already on screen: just send the changed values
+            self.weather_container.update()
+            return
+
         # Show with fade-in
-        self.weather_container.animate_opacity = 300
         self.weather_container.opacity = 0
         self.weather_container.visible = True
         self.page.update()
         await asyncio.sleep(0.1)
         self.weather_container.opacity = 1
-        self.page.update()    
+        self.weather_container.update()
 
-    def create_info_card(self, icon, label, value):
-        """Create an info card for weather details."""
+    def create_info_value(self):
+        """Create the value text shown inside an info card."""
+        return ft.Text(
+            "",
+            size=16,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.BLUE_900,
+        )
+
+    def create_info_card(self, icon, label, value_text):
+        """Create an info card for weather details around a value Text."""
         return ft.Container(
             content=ft.Column(
                 [
                     ft.Icon(icon, size=30, color=ft.Colors.BLUE_700),
                     ft.Text(label, size=12, color=ft.Colors.GREY_600),
-                    ft.Text(
-                        value,
-                        size=16,
-                        weight=ft.FontWeight.BOLD,
-                        color=ft.Colors.BLUE_900,
-                    ),
+                    value_text,
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
                 spacing=5,
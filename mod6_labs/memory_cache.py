@@ -0,0 +1,141 @@
+# memory_cache.py
+"""In-process TTL + LRU cache for weather lookups."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def make_key(
+    city: Optional[str] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    units: str = "metric",
+    precision: int = 2,
+) -> Tuple:
+    """
+    Build a cache key for a city or coordinate lookup.
+
+    City names are case- and whitespace-normalized so "new  york" and
+    "New York" share an entry; coordinates are rounded so nearby points
+    (about 1 km apart at the default precision) do too.
+    """
+    if city is not None:
+        return ("city", " ".join(city.split()).casefold(), units)
+    return ("coord", round(lat, precision), round(lon, precision), units)
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire after `ttl` seconds.
+
+    The least recently used entry is evicted once `max_entries` is exceeded.
+    Expired entries are kept for a further `max_stale` seconds so they can
+    still be served by get_stale() while a refresh is under way.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 600,
+        max_stale: float = 0,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+
+        # Counters
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, stored_at = entry
+        age = self._clock() - stored_at
+        if age > self.ttl:
+            self._expire_if_dead(key, age)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Return (value, age_seconds) for an entry that is fresh or still
+        within the max-stale window, or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, stored_at = entry
+        age = self._clock() - stored_at
+        if self._expire_if_dead(key, age):
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return value, age
+
+    def _expire_if_dead(self, key: Hashable, age: float) -> bool:
+        # Lazy expiry: drop the entry once it is too old even to serve stale
+        if age > self.ttl + self.max_stale:
+            del self._entries[key]
+            self.expirations += 1
+            return True
+        return False
+
+    def set(self, key: Hashable, value: Any, age: float = 0.0):
+        """
+        Store a value, evicting least recently used entries past the cap.
+
+        `age` back-dates the entry, e.g. when promoting a reading loaded
+        from disk that was fetched some time ago.
+        """
+        self._entries[key] = (value, self._clock() - age)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Remove a single entry if present."""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry (counters are kept)."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Snapshot of the cache counters."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
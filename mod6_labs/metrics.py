@@ -0,0 +1,257 @@
+# metrics.py
+"""Instrumentation hooks for WeatherService and the UI.
+
+WeatherService reports events to whatever object is set as its `metrics`
+attribute; it is None by default, and every call site is guarded by that
+one check, so instrumentation costs nothing unless it is switched on.
+
+Usage:
+    metrics = Metrics()
+    service.metrics = metrics
+    ...
+    print(metrics.to_json())          # or metrics.to_prometheus()
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Sequence
+
+# Upper bounds in seconds, spaced for ~1 ms cache hits up to slow retries
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class MetricsHook:
+    """Events WeatherService (and the app) report. Every method is a no-op.
+
+    Subclass and override the events you care about, e.g. to forward them
+    to logging or an external metrics system.
+    """
+
+    def on_request(self, endpoint: str, status: Optional[int], seconds: float):
+        """One HTTP attempt finished; status is None if no response arrived."""
+
+    def on_cache(self, hit: bool):
+        """A cache lookup was a hit or a miss."""
+
+    def on_retry(self, endpoint: str, delay: float):
+        """A failed attempt will be retried after `delay` seconds."""
+
+    def on_pool(self, in_use: int):
+        """The number of requests using pooled connections changed."""
+
+    def on_span(self, name: str, seconds: float):
+        """A timed section of app code (see span()) finished."""
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, as in Prometheus.
+
+    Observing is a bisect and an increment; percentiles are estimated by
+    interpolating within the bucket that contains them.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimated value below which a fraction `q` of observations fall."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self) -> Dict:
+        """Count, mean, max and p50/p95/p99, in milliseconds."""
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.50) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Metrics(MetricsHook):
+    """A hook that aggregates everything in memory.
+
+    Tracks request counts by endpoint and status code, a request latency
+    histogram, cache hits and misses, retries, pooled-connection usage and
+    per-name histograms for UI spans. Safe to feed from several threads.
+    """
+
+    def __init__(self, max_connections: Optional[int] = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.max_connections = max_connections
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.requests: Dict[tuple, int] = {}   # (endpoint, status) -> count
+        self.latency = Histogram(self._buckets)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.retries = 0
+        self.pool_in_use = 0
+        self.pool_peak = 0
+        self.spans: Dict[str, Histogram] = {}
+
+    def on_request(self, endpoint: str, status: Optional[int], seconds: float):
+        key = (endpoint, str(status) if status is not None else "error")
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.observe(seconds)
+
+    def on_cache(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def on_retry(self, endpoint: str, delay: float):
+        with self._lock:
+            self.retries += 1
+
+    def on_pool(self, in_use: int):
+        with self._lock:
+            self.pool_in_use = in_use
+            self.pool_peak = max(self.pool_peak, in_use)
+
+    def on_span(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def to_dict(self) -> Dict:
+        """Snapshot of every metric as plain data."""
+        with self._lock:
+            by_status: Dict[str, int] = {}
+            by_endpoint: Dict[str, int] = {}
+            for (endpoint, status), n in self.requests.items():
+                by_status[status] = by_status.get(status, 0) + n
+                by_endpoint[endpoint] = by_endpoint.get(endpoint, 0) + n
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "requests": {
+                    "total": self.latency.count,
+                    "by_status": by_status,
+                    "by_endpoint": by_endpoint,
+                },
+                "latency": self.latency.summary(),
+                "cache": {
+                    "hits": self.cache_hits,
+                    "misses": self.cache_misses,
+                    "hit_ratio": self.cache_hits / lookups if lookups else 0.0,
+                },
+                "retries": self.retries,
+                "pool": {
+                    "in_use": self.pool_in_use,
+                    "peak": self.pool_peak,
+                    "max_connections": self.max_connections,
+                },
+                "spans": {name: h.summary() for name, h in self.spans.items()},
+            }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "weather") -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name: str, h: Histogram, labels: str = ""):
+            cumulative = 0
+            sep = "," if labels else ""
+            for bound, n in zip(self._buckets + (float("inf"),), h.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_{name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{prefix}_{name}_sum{suffix} {h.sum}")
+            lines.append(f"{prefix}_{name}_count{suffix} {h.count}")
+
+        with self._lock:
+            metric("requests_total", "counter", "HTTP requests made to the weather API.")
+            for (endpoint, status), n in sorted(self.requests.items()):
+                lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+
+            metric("request_duration_seconds", "histogram", "Weather API request latency.")
+            histogram("request_duration_seconds", self.latency)
+
+            metric("cache_lookups_total", "counter", "Weather cache lookups.")
+            lines.append(f'{prefix}_cache_lookups_total{{result="hit"}} {self.cache_hits}')
+            lines.append(f'{prefix}_cache_lookups_total{{result="miss"}} {self.cache_misses}')
+
+            metric("retries_total", "counter", "Retried weather API requests.")
+            lines.append(f"{prefix}_retries_total {self.retries}")
+
+            metric("pool_connections_in_use", "gauge", "Requests currently using pooled connections.")
+            lines.append(f"{prefix}_pool_connections_in_use {self.pool_in_use}")
+            metric("pool_connections_peak", "gauge", "Most requests using pooled connections at once.")
+            lines.append(f"{prefix}_pool_connections_peak {self.pool_peak}")
+
+            if self.spans:
+                metric("span_duration_seconds", "histogram", "Timed sections of app code.")
+                for name, h in sorted(self.spans.items()):
+                    histogram("span_duration_seconds", h, f'span="{name}"')
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Write a snapshot to `path`: Prometheus text for .prom/.txt, else JSON."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+_NULL_SPAN = nullcontext()
+
+
+@contextmanager
+def _timed(hook: MetricsHook, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        hook.on_span(name, time.perf_counter() - start)
+
+
+def span(hook: Optional[MetricsHook], name: str):
+    """
+    Time a block of code and report it to `hook` as span `name`.
+
+    Usage:
+        with span(self.metrics, "search"):
+            ...
+
+    With hook=None this returns a shared no-op context manager.
+    """
+    return _NULL_SPAN if hook is None else _timed(hook, name)
+
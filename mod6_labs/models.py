@@ -0,0 +1,54 @@
+# models.py
+"""Compact typed models for weather data."""
+
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+
+@dataclass(frozen=True)
+class WeatherReading:
+    """The fields of a current-weather response that the app uses.
+
+    Declared with __slots__, so each reading is a small fixed-size object
+    instead of the full nested API payload.
+    """
+
+    __slots__ = (
+        "name",
+        "country",
+        "temp",
+        "feels_like",
+        "humidity",
+        "description",
+        "icon",
+        "wind_speed",
+    )
+
+    name: str
+    country: str
+    temp: float
+    feels_like: float
+    humidity: int
+    description: str
+    icon: str
+    wind_speed: float
+
+    @classmethod
+    def from_api(cls, data: Dict) -> "WeatherReading":
+        """Build a reading from a raw OpenWeatherMap current-weather payload."""
+        main = data.get("main", {})
+        weather = (data.get("weather") or [{}])[0]
+        return cls(
+            name=data.get("name", "Unknown"),
+            country=data.get("sys", {}).get("country", ""),
+            temp=main.get("temp", 0),
+            feels_like=main.get("feels_like", 0),
+            humidity=main.get("humidity", 0),
+            description=weather.get("description", ""),
+            icon=weather.get("icon", "01d"),
+            wind_speed=data.get("wind", {}).get("speed", 0),
+        )
+
+    def to_dict(self) -> Dict:
+        """Flat dict form, e.g. for JSON serialization."""
+        return asdict(self)
@@ -0,0 +1,119 @@
+# rate_limiter.py
+"""Client-side token-bucket rate limiting for the weather API quota."""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call would have to wait longer than its max_wait."""
+    pass
+
+
+class TokenBucket:
+    """Async-aware token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity` (the
+    allowed burst). A caller that finds the bucket empty reserves the next
+    token anyway, driving the level negative, and sleeps until its token
+    would have arrived. Reservations are made in arrival order, so waiting
+    callers are served first come, first served without a queue object.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        # A plain lock: the bucket may be shared by services on different loops
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.acquired = 0
+        self.rejected = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, max_wait: Optional[float]) -> Optional[float]:
+        """Take one token, returning how long to wait for it (None if too long)."""
+        with self._lock:
+            self._refill(self._clock())
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                self.rejected += 1
+                return None
+            self._tokens -= 1
+            return wait
+
+    async def acquire(self, max_wait: Optional[float] = None):
+        """
+        Wait until a call is allowed.
+
+        Args:
+            max_wait: Give up instead of waiting longer than this many seconds
+
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait
+        """
+        wait = self._reserve(max_wait)
+        if wait is None:
+            raise RateLimitExceeded(
+                f"Rate limit reached; next call allowed in more than {max_wait:.0f}s"
+            )
+
+        if wait > 0:
+            self.waiting += 1
+            self.total_wait += wait
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                with self._lock:
+                    self._tokens += 1  # hand the reserved token back
+                raise
+            finally:
+                self.waiting -= 1
+        self.acquired += 1
+
+    @property
+    def level(self) -> float:
+        """Tokens currently available (negative while callers are queued)."""
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
+
+    def stats(self) -> Dict:
+        """Snapshot of the bucket level and queueing metrics."""
+        return {
+            "level": self.level,
+            "capacity": self.capacity,
+            "rate_per_second": self.rate,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "waiting": self.waiting,
+            "total_wait": self.total_wait,
+        }
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(name: str, rate: float, capacity: float) -> TokenBucket:
+    """
+    Return the process-wide bucket for `name`, creating it on first use.
+
+    Every WeatherService in the process passes the same name, so they all
+    draw from one bucket, matching how the API enforces its quota.
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = _buckets[name] = TokenBucket(rate, capacity)
+        return bucket
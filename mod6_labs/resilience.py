@@ -0,0 +1,119 @@
+# resilience.py
+"""Retry backoff and circuit breaking for upstream API calls."""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header into seconds.
+
+    Accepts both forms allowed by HTTP: delta-seconds ("120") and an
+    HTTP-date. Returns None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for idempotent requests."""
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        rand=random.random,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rand = rand
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to wait before retry number `attempt` (0-based).
+
+        A server-provided Retry-After wins over the computed backoff. Returns
+        None if no more retries should be made, including when the server
+        asks us to wait longer than max_delay.
+        """
+        if attempt >= self.max_retries:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return self._rand() * ceiling
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    allow() returns False for `cooldown` seconds. Then a single trial call
+    is let through (half-open): success closes the circuit, failure opens it
+    for another cooldown.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+        # Counters
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may be attempted now."""
+        if self.state == self.CLOSED:
+            return True
+
+        now = self._clock()
+        if now - self._opened_at >= self.cooldown:
+            # Let one trial through; restarting the timer means a trial
+            # that never reports back only blocks for one more cooldown
+            self.state = self.HALF_OPEN
+            self._opened_at = now
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self._opened_at = self._clock()
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial call is allowed (0 if closed)."""
+        if self.state == self.CLOSED:
+            return 0.0
+        return max(0.0, self.cooldown - (self._clock() - self._opened_at))
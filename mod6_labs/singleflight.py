@@ -0,0 +1,62 @@
+# singleflight.py
+"""Request coalescing for concurrent identical lookups."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Run at most one in-flight call per key.
+
+    Callers that arrive while a call for the same key is running await that
+    call instead of starting their own, and all of them receive its result
+    (or its exception).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        # Counters
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await func() for this key, sharing the call with concurrent callers.
+
+        Args:
+            key: Identity of the call (e.g. a memory_cache.make_key key)
+            func: Zero-argument coroutine function that performs the work
+
+        Returns:
+            Whatever func() returns
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            self.deduplicated += 1
+
+        # Shield so one caller giving up doesn't cancel the others' request
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    def in_flight(self) -> int:
+        """Number of keys with a call currently running."""
+        return len(self._inflight)
+
+    def stats(self) -> Dict:
+        """Snapshot of the coalescing counters."""
+        return {
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+        }
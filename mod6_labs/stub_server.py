@@ -0,0 +1,187 @@
+# stub_server.py
+"""Local stub of the OpenWeatherMap API for tests and benchmarks."""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_weather(city: str = "London") -> dict:
+    """Build a current-weather payload shaped like OpenWeatherMap's."""
+    return {
+        "coord": {"lon": -0.13, "lat": 51.51},
+        "weather": [
+            {"id": 803, "main": "Clouds", "description": "broken clouds", "icon": "04d"}
+        ],
+        "main": {
+            "temp": 15.2,
+            "feels_like": 14.6,
+            "temp_min": 13.9,
+            "temp_max": 16.4,
+            "pressure": 1012,
+            "humidity": 72,
+        },
+        "wind": {"speed": 4.1, "deg": 240},
+        "sys": {"country": "GB"},
+        "name": city.strip().title(),
+        "cod": 200,
+    }
+
+
+def fake_forecast(city: str = "London", steps: int = 40, start: int = 1_700_000_000) -> dict:
+    """Build a 5-day/3-hour forecast payload shaped like OpenWeatherMap's."""
+    entries = []
+    for i in range(steps):
+        temp = round(12 + 4 * ((i % 8) - 4) / 4, 2)  # a daily up-and-down cycle
+        entries.append({
+            "dt": start + i * 3 * 3600,
+            "main": {
+                "temp": temp,
+                "feels_like": temp - 0.8,
+                "temp_min": temp - 0.5,
+                "temp_max": temp + 0.5,
+                "pressure": 1012,
+                "humidity": 70 + i % 10,
+            },
+            "weather": [
+                {"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}
+            ],
+            "wind": {"speed": 3.6 + (i % 5) / 10, "deg": 220},
+            "pop": 0.2,
+            "dt_txt": "",
+        })
+    return {
+        "cod": "200",
+        "message": 0,
+        "cnt": steps,
+        "list": entries,
+        "city": {"name": city.strip().title(), "country": "GB", "timezone": 0},
+    }
+
+
+class Faults:
+    """Latency and error injection shared by the stub server and transport.
+
+    Every response is delayed by `latency` seconds plus up to `jitter`
+    more, and a fraction `error_rate` of requests fail with `error_status`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def roll(self) -> Tuple[float, Optional[int]]:
+        """Pick this request's delay and, if it should fail, its status code."""
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter) if self.jitter else self.latency
+            failed = self.error_rate and self._rng.random() < self.error_rate
+        return delay, self.error_status if failed else None
+
+
+def respond(path: str, city: str, faults: Optional[Faults]) -> Tuple[int, dict, float]:
+    """Status, payload and delay for one stubbed request."""
+    delay, error = faults.roll() if faults is not None else (0.0, None)
+    if error is not None:
+        return error, {"cod": error, "message": "injected failure"}, delay
+    payload = fake_forecast(city) if path.endswith("/forecast") else fake_weather(city)
+    return 200, payload, delay
+
+
+def mock_client(faults: Optional[Faults] = None, **client_kwargs):
+    """
+    An httpx.AsyncClient answered in-process, with no sockets involved.
+
+    Delays are asyncio sleeps, so thousands of concurrent requests are cheap.
+    """
+    import httpx
+
+    async def handler(request):
+        status, payload, delay = respond(
+            request.url.path, request.url.params.get("q", "London"), faults
+        )
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(status, json=payload)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), **client_kwargs)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a canned weather (or forecast) payload."""
+
+    # HTTP/1.1 so clients can keep the connection alive between requests
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        city = parse_qs(url.query).get("q", ["London"])[0]
+        status, payload, delay = respond(url.path, city, self.server.faults)
+        if delay:
+            time.sleep(delay)
+        body = json.dumps(payload).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+
+class StubWeatherServer:
+    """Threaded HTTP server bound to a free localhost port.
+
+    Usage:
+        with StubWeatherServer(faults=Faults(latency=0.05, error_rate=0.01)) as server:
+            service.base_url = server.url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, faults: Optional[Faults] = None):
+        self._server = ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.faults = faults
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/data/2.5/weather"
+
+    @property
+    def forecast_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/data/2.5/forecast"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -1,9 +1,48 @@
 """Simple tests for weather service."""
 
 import asyncio
+import json
+import os
+import tempfile
+import httpx
+from array import array
+from cache_manager import CacheStore
+from city_index import CityIndex
+from history_store import HistoryStore, HistoryWriter
+from icon_cache import IconCache
+from metrics import Metrics
+from models import WeatherReading
+from rate_limiter import RateLimitExceeded, TokenBucket
+from resilience import CircuitBreaker, RetryPolicy
+from stub_server import fake_forecast, fake_weather
+from units import convert_speed, convert_temperature
 from weather_service import WeatherService, WeatherServiceError
 
 
+def make_stub_service(handler=None):
+    """Build a WeatherService whose client answers from an in-process stub.
+    
+    Returns the service and the list of requests that reached the stub.
+    """
+    calls = []
+    
+    def default_handler(request):
+        city = request.url.params.get("q", "London")
+        if request.url.path.endswith("/forecast"):
+            return httpx.Response(200, json=fake_forecast(city))
+        return httpx.Response(200, json=fake_weather(city))
+    
+    def recording_handler(request):
+        calls.append(request)
+        return (handler or default_handler)(request)
+    
+    client = httpx.AsyncClient(transport=httpx.MockTransport(recording_handler))
+    service = WeatherService(client=client)
+    service.api_key = "test"  # the stub needs no real key (or .env)
+    service.limiter = None  # the stub has no quota to protect
+    return service, calls
+
+
 async def test_valid_city():
     """Test fetching weather for a valid city."""
     service = WeatherService()
@@ -41,6 +80,432 @@ async def test_empty_city():
         return True
 
 
+async def test_cache_hit():
+    """Test that a repeat lookup is served from the in-memory cache."""
+    service, calls = make_stub_service()
+    first = await service.get_weather("London")
+    second = await service.get_weather("  london ")
+    if len(calls) == 1 and second is first and service.cache.hits == 1:
+        print("✅ Repeat lookup served from cache")
+        return True
+    print(f"❌ Expected 1 upstream call, got {len(calls)}")
+    return False
+
+
+async def test_cache_bypass():
+    """Test that use_cache=False forces a network request."""
+    service, calls = make_stub_service()
+    await service.get_weather("London")
+    await service.get_weather("London", use_cache=False)
+    if len(calls) == 2:
+        print("✅ Cache bypass hit the network")
+        return True
+    print(f"❌ Expected 2 upstream calls, got {len(calls)}")
+    return False
+
+
+async def test_persistent_cache():
+    """Test that a new service instance warms from the on-disk store."""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CacheStore(os.path.join(tmp, "cache.db"))
+        service, calls = make_stub_service()
+        service.store = store
+        await service.get_weather("London")
+        await service.get_weather("Paris")
+        
+        restarted, restarted_calls = make_stub_service()
+        restarted.store = store
+        data = await restarted.get_weather("London")
+        store.close()
+    
+    if len(calls) == 2 and not restarted_calls and data["name"] == "London":
+        print("✅ Restarted service served the cached city from disk")
+        return True
+    print("❌ Persistent cache did not serve the restarted lookup")
+    return False
+
+
+async def test_coalesced_lookups():
+    """Test that concurrent lookups for one city share a single request."""
+    async def slow_handler(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=fake_weather("London"))
+    
+    service, calls = make_stub_service(slow_handler)
+    results = await asyncio.gather(
+        *(service.get_weather("London") for _ in range(5))
+    )
+    if len(calls) == 1 and service.inflight.deduplicated == 4 and all(
+        r["name"] == "London" for r in results
+    ):
+        print("✅ 5 concurrent lookups made 1 upstream request")
+        return True
+    print(f"❌ Expected 1 upstream call, got {len(calls)}")
+    return False
+
+
+async def test_coalesced_error():
+    """Test that every coalesced caller receives the shared error."""
+    async def failing_handler(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(404)
+    
+    service, calls = make_stub_service(failing_handler)
+    results = await asyncio.gather(
+        *(service.get_weather("Atlantis") for _ in range(3)),
+        return_exceptions=True,
+    )
+    if len(calls) == 1 and all(isinstance(r, WeatherServiceError) for r in results):
+        print("✅ Coalesced callers all received the error")
+        return True
+    print(f"❌ Unexpected results: {results}")
+    return False
+
+
+async def test_batch_fetch():
+    """Test that one failing city doesn't cancel the rest of a batch."""
+    active = 0
+    peak = 0
+    
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        city = request.url.params["q"]
+        if city == "Atlantis":
+            return httpx.Response(404)
+        return httpx.Response(200, json=fake_weather(city))
+    
+    service, calls = make_stub_service(handler)
+    cities = [f"City{i}" for i in range(20)] + ["Atlantis"]
+    results = await service.get_weather_many(cities, concurrency=4)
+    
+    failed = [r.city for r in results if r.error]
+    batch_peak = peak
+    streamed = [r async for r in service.iter_weather_many(cities, use_cache=False)]
+    if failed == ["Atlantis"] and batch_peak <= 4 and len(streamed) == len(cities):
+        print(f"✅ Batch of {len(cities)} fetched with peak concurrency {batch_peak}")
+        return True
+    print(f"❌ Unexpected batch outcome: failed={failed}, peak={batch_peak}")
+    return False
+
+
+async def test_stale_reading():
+    """Test that an expired reading is still served by peek(), flagged stale."""
+    service, calls = make_stub_service()
+    await service.get_weather("London")
+    service.cache.ttl = 0  # expire everything immediately
+    await asyncio.sleep(0.01)
+    
+    cached = service.peek("London")
+    if cached is not None and cached.stale and len(calls) == 1:
+        print(f"✅ Stale reading served without a request ({cached.age:.2f}s old)")
+        return True
+    print(f"❌ Expected a stale cached reading, got {cached}")
+    return False
+
+
+async def test_retry_then_success():
+    """Test that 429 and 5xx responses are retried until one succeeds."""
+    responses = [
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(503),
+        httpx.Response(200, json=fake_weather("London")),
+    ]
+    service, calls = make_stub_service(lambda request: responses[len(calls) - 1])
+    service.retry = RetryPolicy(max_retries=2, base_delay=0.001)
+    try:
+        data = await service.get_weather("London")
+    except WeatherServiceError as e:
+        print(f"❌ Retries did not recover: {e}")
+        return False
+    if len(calls) == 3 and service.retries == 2 and data["name"] == "London":
+        print("✅ Recovered after a 429 and a 503")
+        return True
+    print(f"❌ Expected 3 attempts, got {len(calls)}")
+    return False
+
+
+async def test_circuit_breaker():
+    """Test that the breaker fails fast after repeated failures."""
+    service, calls = make_stub_service(lambda request: httpx.Response(500))
+    service.retry = RetryPolicy(max_retries=0)
+    service.breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    
+    for city in ("A", "B", "C", "D"):
+        try:
+            await service.get_weather(city)
+        except WeatherServiceError:
+            pass
+    if len(calls) == 2 and service.breaker.state == CircuitBreaker.OPEN:
+        print("✅ Circuit opened after 2 failures and skipped 2 requests")
+        return True
+    print(f"❌ Expected 2 upstream calls, got {len(calls)}")
+    return False
+
+
+async def test_rate_limiter():
+    """Test that calls past the burst are queued, and rejected past max_wait."""
+    service, calls = make_stub_service()
+    service.limiter = TokenBucket(rate=50, capacity=2)  # 2 at once, then 1 per 20 ms
+    
+    start = asyncio.get_running_loop().time()
+    await service.get_weather_many([f"City{i}" for i in range(5)])
+    elapsed = asyncio.get_running_loop().time() - start
+    
+    try:
+        await service.limiter.acquire(max_wait=0)
+        rejected = False
+    except RateLimitExceeded:
+        rejected = True
+    
+    if len(calls) == 5 and elapsed >= 0.05 and rejected:
+        print(f"✅ 5 calls throttled to {elapsed * 1000:.0f} ms, empty bucket rejected")
+        return True
+    print(f"❌ Unexpected throttling: {elapsed * 1000:.0f} ms, rejected={rejected}")
+    return False
+
+
+async def test_parsed_readings():
+    """Test that parse_readings hands out compact WeatherReading objects."""
+    service, calls = make_stub_service()
+    service.parse_readings = True
+    reading = await service.get_weather("London")
+    cached = await service.get_weather("London")
+    if (
+        isinstance(reading, WeatherReading)
+        and cached is reading
+        and reading.temp == 15.2
+        and reading.icon == "04d"
+    ):
+        print(f"✅ Parsed reading: {reading.name}, {reading.temp}°C, {reading.description}")
+        return True
+    print(f"❌ Expected a WeatherReading, got {type(reading).__name__}")
+    return False
+
+
+async def test_offline_first():
+    """Test offline fallback, fail-fast, and replay when the network returns."""
+    network = {"up": True}
+    
+    def handler(request):
+        if not network["up"]:
+            raise httpx.ConnectError("network down", request=request)
+        return httpx.Response(200, json=fake_weather(request.url.params["q"]))
+    
+    service, calls = make_stub_service(handler)
+    service.connectivity.recheck_after = 0.05
+    refreshed = []
+    service.add_refresh_listener(lambda city, data: refreshed.append(city))
+    
+    await service.get_weather("London")
+    network["up"] = False
+    offline = await service.get_weather_offline_first("London")
+    attempts_while_down = len(calls)
+    try:
+        await service.get_weather("Paris", use_cache=False)
+        failed_fast = False
+    except WeatherServiceError:
+        failed_fast = len(calls) == attempts_while_down
+    
+    network["up"] = True
+    await asyncio.sleep(0.2)  # let the probe notice and replay the queue
+    
+    if offline.offline and failed_fast and refreshed == ["London"] and service._replay_task is None:
+        print("✅ Served cached reading offline and replayed refresh on reconnect")
+        return True
+    print(f"❌ offline={offline.offline}, failed_fast={failed_fast}, refreshed={refreshed}, "
+          f"replay task left: {service._replay_task}")
+    return False
+
+
+async def test_city_autocomplete():
+    """Test prefix suggestions: accent-insensitive, history first, then population."""
+    index = CityIndex([
+        ("London, GB", 8_900_000), ("London, CA", 420_000), ("Los Angeles, US", 3_900_000),
+        ("São Paulo, BR", 12_300_000), ("Lonavala, IN", 57_000),
+    ])
+    by_population = index.search("lo", limit=3)
+    with_history = index.search("lon", limit=3, preferred=["Lonavala, IN"])
+    accents = index.search("sao")
+    if (
+        by_population == ["London, GB", "Los Angeles, US", "London, CA"]
+        and with_history == ["Lonavala, IN", "London, GB", "London, CA"]
+        and accents == ["São Paulo, BR"]
+    ):
+        print("✅ Suggestions ranked by history, then population")
+        return True
+    print(f"❌ Unexpected suggestions: {by_population}, {with_history}, {accents}")
+    return False
+
+
+async def test_history_writer():
+    """Test history saves are debounced, coalesced, atomic and fail quietly."""
+    loop = asyncio.get_running_loop()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.json")
+        writer = HistoryWriter(path, loop, interval_ms=50)
+        for i in range(5):
+            writer.save([f"City {i}"])
+        await asyncio.sleep(0.01)
+        early = os.path.exists(path)             # still inside the debounce window
+        await asyncio.sleep(0.15)
+        with open(path) as f:
+            saved = json.load(f)
+        writer.save(lambda: ["Tokyo"])
+        await writer.close()                     # flushes without waiting
+        with open(path) as f:
+            closed = json.load(f)
+        leftovers = sorted(os.listdir(tmp))      # no temp files from the atomic write
+        
+        broken = HistoryWriter(os.path.join(tmp, "missing", "history.json"), loop, interval_ms=10)
+        broken.save(["Paris"])
+        await asyncio.sleep(0.1)
+    
+    if (
+        not early and saved == ["City 4"] and closed == ["Tokyo"] and writer.writes == 2
+        and leftovers == ["history.json"]
+        and isinstance(broken.last_error, OSError) and broken.writes == 0
+    ):
+        print("✅ History writes coalesced into 2, failed write recorded")
+        return True
+    print(f"❌ Unexpected writer state: {saved}, {closed}, {writer.writes} writes, {leftovers}")
+    return False
+
+
+async def test_history_frecency():
+    """Test history ranking, move-to-front, eviction and both file formats."""
+    day = 24 * 3600
+    history = HistoryStore(max_entries=3, half_life=7 * day)
+    for _ in range(5):
+        history.touch("Tokyo", now=0)       # frequent but a month old
+    history.touch("Paris", now=30 * day)
+    history.touch("Lima", now=30 * day)
+    history.touch("London", now=31 * day)   # evicts the least recent (Tokyo)
+    history.touch("Paris", now=32 * day)
+    
+    legacy = HistoryStore.from_data(["Oslo", "Rome"])
+    restored = HistoryStore.from_data(json.loads(json.dumps(history.snapshot())))
+    if (
+        history.recent(3) == ["Paris", "London", "Lima"]
+        and "Tokyo" not in history
+        and history.top(2) == ["Paris", "London"]
+        and restored.top(3) == history.top(3)
+        and legacy.recent(2) == ["Oslo", "Rome"]
+        and history.search("l", 5) == ["London", "Lima"]
+    ):
+        print("✅ History ranked by frecency, legacy list format still loads")
+        return True
+    print(f"❌ recent={history.recent(3)}, top={history.top(3)}, legacy={legacy.recent(2)}")
+    return False
+
+
+async def test_forecast():
+    """Test the forecast is streamed into columns and aggregated per day."""
+    service, calls = make_stub_service()
+    forecast = await service.get_forecast("London")
+    cached = await service.get_forecast("london")
+    days = forecast.daily_min_max()
+    temps = forecast.column("temp")
+    if (
+        len(forecast) == 40
+        and cached is forecast
+        and len(calls) == 1
+        and forecast.city == "London"
+        and len(days) in (5, 6)
+        and min(d.low for d in days) == min(forecast.temp_min)
+        and max(temps) == max(fake_forecast()["list"], key=lambda e: e["main"]["temp"])["main"]["temp"]
+    ):
+        print(f"✅ Forecast: {len(forecast)} timesteps over {len(days)} days, cached")
+        return True
+    print(f"❌ Unexpected forecast: {len(forecast)} steps, {len(calls)} calls, days={days}")
+    return False
+
+
+async def test_unit_conversion():
+    """Test metric/imperial/standard conversion on scalars and forecast columns."""
+    service, _ = make_stub_service()
+    forecast = await service.get_forecast("London")
+    imperial = forecast.to_units("imperial")
+    expected_f = [t * 9 / 5 + 32 for t in forecast.temp]
+    if (
+        convert_temperature(100, "metric", "imperial") == 212
+        and abs(convert_temperature(32, "imperial", "standard") - 273.15) < 1e-9
+        and abs(convert_speed(10, "metric", "imperial") - 22.369) < 1e-3
+        and convert_speed(5, "standard", "metric") == 5
+        and list(convert_temperature(array("i", [0, 100]), "metric", "imperial")) == [32.0, 212.0]
+        and all(abs(a - b) < 1e-9 for a, b in zip(imperial.temp, expected_f))
+        and imperial.units == "imperial"
+        and list(forecast.temp) != list(imperial.temp)
+    ):
+        print("✅ Units converted for scalars and whole forecast columns")
+        return True
+    print(f"❌ Conversion mismatch: {list(imperial.temp)[:3]} vs {expected_f[:3]}")
+    return False
+
+
+async def test_metrics():
+    """Test request, status, latency, cache, retry and pool metrics."""
+    responses = [httpx.Response(503), httpx.Response(200, json=fake_weather("London"))]
+    
+    def handler(request):
+        return responses.pop(0) if responses else httpx.Response(404)
+    
+    service, _ = make_stub_service(handler)
+    service.retry.base_delay = 0.01
+    metrics = Metrics(max_connections=4)
+    service.metrics = metrics
+    
+    await service.get_weather("London")
+    await service.get_weather("London")         # cache hit
+    try:
+        await service.get_weather("Atlantis")
+    except WeatherServiceError:
+        pass
+    
+    stats = metrics.to_dict()
+    prometheus = metrics.to_prometheus()
+    if (
+        stats["requests"]["by_status"] == {"503": 1, "200": 1, "404": 1}
+        and stats["retries"] == 1
+        and stats["cache"]["hits"] == 1
+        and stats["pool"]["peak"] == 1 and stats["pool"]["in_use"] == 0
+        and stats["latency"]["p99_ms"] > 0
+        and 'weather_requests_total{endpoint="weather",status="200"} 1' in prometheus
+        and 'weather_request_duration_seconds_bucket{le="+Inf"} 3' in prometheus
+    ):
+        print(f"✅ Metrics: {stats['requests']['total']} requests, p50 {stats['latency']['p50_ms']:.2f} ms")
+        return True
+    print(f"❌ Unexpected metrics: {stats}")
+    return False
+
+
+async def test_icon_cache_disk_errors():
+    """Test icons are still served when the cache directory can't be written."""
+    requests = []
+    
+    def handler(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, content=b"png")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        blocker = os.path.join(tmp, "not-a-dir")
+        with open(blocker, "w") as f:
+            f.write("")     # makedirs under a file raises OSError
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            icons = IconCache(lambda: client, os.path.join(blocker, "icons"))
+            encoded = await icons.get("01d")
+            await icons.prefetch(["01d", "02d", "03n"])
+    
+    if encoded == "cG5n" and icons.cached("03n") == "cG5n" and len(requests) == 3:
+        print("✅ Icons served from memory when the disk write fails")
+        return True
+    print(f"❌ Unexpected icons: {encoded!r}, {len(requests)} downloads")
+    return False
+
+
 async def run_tests():
     """Run all tests."""
     print("Running Weather Service Tests\n")
@@ -50,6 +515,25 @@ async def run_tests():
     results.append(await test_valid_city())
     results.append(await test_invalid_city())
     results.append(await test_empty_city())
+    results.append(await test_cache_hit())
+    results.append(await test_cache_bypass())
+    results.append(await test_persistent_cache())
+    results.append(await test_coalesced_lookups())
+    results.append(await test_coalesced_error())
+    results.append(await test_batch_fetch())
+    results.append(await test_stale_reading())
+    results.append(await test_retry_then_success())
+    results.append(await test_circuit_breaker())
+    results.append(await test_rate_limiter())
+    results.append(await test_parsed_readings())
+    results.append(await test_offline_first())
+    results.append(await test_city_autocomplete())
+    results.append(await test_history_writer())
+    results.append(await test_history_frecency())
+    results.append(await test_forecast())
+    results.append(await test_unit_conversion())
+    results.append(await test_metrics())
+    results.append(await test_icon_cache_disk_errors())
     
     print("\n" + "=" * 50)
     passed = sum(results)
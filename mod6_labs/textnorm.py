@@ -0,0 +1,11 @@
+# textnorm.py
+"""Text folding shared by the city index and search history."""
+
+import unicodedata
+
+
+def normalize(text: str) -> str:
+    """Fold case, accents and whitespace so "são  paulo" matches "Sao Paulo"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
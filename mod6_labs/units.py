@@ -0,0 +1,116 @@
+# units.py
+"""Unit conversion between OpenWeatherMap's metric, imperial and standard units.
+
+    metric    temperature °C, wind speed m/s
+    imperial  temperature °F, wind speed mph
+    standard  temperature K,  wind speed m/s
+
+Every conversion is linear (y = scale * x + offset), so one function handles
+a single value, a list, an array("d") or a NumPy array; array-backed input
+is converted in a single vectorized pass when NumPy is installed.
+"""
+
+from array import array
+from fractions import Fraction
+from typing import Dict, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; arrays fall back to a Python loop
+    np = None
+
+UNIT_SYSTEMS = ("metric", "imperial", "standard")
+
+TEMPERATURE_SYMBOLS = {"metric": "°C", "imperial": "°F", "standard": "K"}
+SPEED_SYMBOLS = {"metric": "m/s", "imperial": "mph", "standard": "m/s"}
+
+# Each system's value expressed in kelvin / metres per second: (scale, offset).
+# Exact fractions, so composed factors come out as 1.8 and 32, not 31.999...
+_TO_KELVIN: Dict[str, Tuple[Fraction, Fraction]] = {
+    "metric": (Fraction(1), Fraction("273.15")),
+    "imperial": (Fraction(5, 9), Fraction("273.15") - Fraction(160, 9)),
+    "standard": (Fraction(1), Fraction(0)),
+}
+_TO_MPS: Dict[str, Tuple[Fraction, Fraction]] = {
+    "metric": (Fraction(1), Fraction(0)),
+    "imperial": (Fraction("0.44704"), Fraction(0)),  # 1 mph is exactly 0.44704 m/s
+    "standard": (Fraction(1), Fraction(0)),
+}
+
+
+def _check(units: str):
+    if units not in UNIT_SYSTEMS:
+        raise ValueError(f"Unknown units {units!r}; expected one of {', '.join(UNIT_SYSTEMS)}")
+
+
+def _compose(table: Dict[str, Tuple[Fraction, Fraction]]) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """(scale, offset) of from_units -> base -> to_units, for every pair."""
+    factors = {}
+    for from_units, (scale_in, offset_in) in table.items():
+        for to_units, (scale_out, offset_out) in table.items():
+            factors[from_units, to_units] = (
+                float(scale_in / scale_out),
+                float((offset_in - offset_out) / scale_out),
+            )
+    return factors
+
+
+# Precomputed, so converting one value is a dict lookup and a multiply-add
+_TEMPERATURE_FACTORS = _compose(_TO_KELVIN)
+_SPEED_FACTORS = _compose(_TO_MPS)
+_SCALARS = (float, int)
+
+
+def _unknown(from_units: str, to_units: str):
+    """Raise the ValueError for a pair missing from the factor tables."""
+    _check(from_units)
+    _check(to_units)
+
+
+def _apply(values, scale: float, offset: float):
+    """y = scale * x + offset, keeping the container type of `values`."""
+    if scale == 1.0 and offset == 0.0:
+        return values
+    if np is not None and isinstance(values, np.ndarray):
+        return values * scale + offset
+    if isinstance(values, array):
+        # Only array("d") can be viewed as float64 and hold the fractional
+        # results; other typecodes are converted value by value into one
+        if np is not None and values.typecode == "d":
+            converted = np.frombuffer(values, dtype=np.float64) * scale + offset
+            out = array("d")
+            out.frombytes(converted.tobytes())
+            return out
+        return array("d", [v * scale + offset for v in values])
+    if isinstance(values, (list, tuple)):
+        return type(values)(v * scale + offset for v in values)
+    return values * scale + offset
+
+
+def convert_temperature(values, from_units: str, to_units: str):
+    """
+    Convert temperatures between unit systems.
+
+    Args:
+        values: A number, list, tuple, array("d") or NumPy array
+        from_units: "metric", "imperial" or "standard"
+        to_units: "metric", "imperial" or "standard"
+
+    Returns:
+        The converted value(s), in the same kind of container
+
+    Raises:
+        ValueError: If either unit system is unknown
+    """
+    scale, offset = _TEMPERATURE_FACTORS.get((from_units, to_units)) or _unknown(from_units, to_units)
+    if type(values) in _SCALARS:  # fast path for single readings
+        return values if scale == 1.0 and offset == 0.0 else values * scale + offset
+    return _apply(values, scale, offset)
+
+
+def convert_speed(values, from_units: str, to_units: str):
+    """Convert wind speeds between unit systems (see convert_temperature)."""
+    scale, offset = _SPEED_FACTORS.get((from_units, to_units)) or _unknown(from_units, to_units)
+    if type(values) in _SCALARS:
+        return values if scale == 1.0 and offset == 0.0 else values * scale + offset
+    return _apply(values, scale, offset)
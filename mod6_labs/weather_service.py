@@ -1,9 +1,27 @@
 # weather_service.py
 """Weather API service layer."""
 
+import asyncio
+import logging
+import time
 import httpx
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Union
 from config import Config
+from connectivity import Connectivity
+from forecast import Forecast, ForecastParser
+from memory_cache import TTLCache, make_key
+from metrics import MetricsHook
+from models import WeatherReading
+from rate_limiter import RateLimitExceeded, shared_bucket
+from resilience import CircuitBreaker, RetryPolicy, parse_retry_after
+from singleflight import SingleFlight
+
+
+log = logging.getLogger(__name__)
+
+# What lookups return: the raw API payload, or a parsed WeatherReading
+Weather = Union[Dict, WeatherReading]
 
 
 class WeatherServiceError(Exception):
@@ -11,23 +29,220 @@ class WeatherServiceError(Exception):
     pass
 
 
+class CircuitOpenError(WeatherServiceError):
+    """Raised without a request while the circuit breaker is open."""
+    pass
+
+
+class OfflineError(WeatherServiceError):
+    """Raised when the network is unreachable (or was, moments ago)."""
+    pass
+
+
+class _ClientError(WeatherServiceError):
+    """A request the API rejected (bad city, bad key): not worth retrying."""
+    pass
+
+
+class BatchResult(NamedTuple):
+    """Outcome of one city in a batch fetch: either data or an error."""
+    city: str
+    data: Optional[Weather]
+    error: Optional[WeatherServiceError]
+
+
+class CachedReading(NamedTuple):
+    """A reading found in cache, with how old it is."""
+    data: Weather
+    age: float      # seconds since it was fetched
+    stale: bool     # past its TTL
+    offline: bool = False   # served because the network is down
+
+
 class WeatherService:
     """Service for fetching weather data from OpenWeatherMap API."""
     
-    def __init__(self):
-        self.api_key = Config.API_KEY
-        self.base_url = Config.BASE_URL
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        store=None,
+        parse_readings: bool = False,
+    ):
+        # Resolved from Config on first network use (see _ensure_config)
+        self.api_key: Optional[str] = None
+        self.base_url: Optional[str] = None
+        self.forecast_url: Optional[str] = None
         self.timeout = Config.TIMEOUT
+        self.units = Config.UNITS
+        
+        # Hand out compact WeatherReading objects instead of raw payloads;
+        # parsing happens once per fetch and caches hold the small form
+        self.parse_readings = parse_readings
+        
+        # Recent readings, keyed by normalized city / rounded coordinates + units
+        self.cache = TTLCache(
+            max_entries=Config.CACHE_MAX_ENTRIES,
+            ttl=Config.CACHE_TTL,
+            max_stale=Config.MAX_STALE,
+        )
+        
+        # Optional persistent cache (cache_manager.CacheStore) checked after
+        # the in-memory cache, so a restarted app warms from disk
+        self.store = store
+        
+        # Concurrent lookups for the same key share one upstream request
+        self.inflight = SingleFlight()
+        
+        # Retries for transient failures, and fail-fast while upstream is down
+        self.retry = RetryPolicy(
+            max_retries=Config.MAX_RETRIES,
+            base_delay=Config.RETRY_BACKOFF_BASE,
+            max_delay=Config.RETRY_BACKOFF_MAX,
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+            cooldown=Config.CIRCUIT_COOLDOWN,
+        )
+        self.retries = 0
+        
+        # Throttle to the API quota; the bucket is shared process-wide
+        self.limiter = None
+        if Config.RATE_LIMIT_PER_MINUTE:
+            self.limiter = shared_bucket(
+                "openweathermap",
+                rate=Config.RATE_LIMIT_PER_MINUTE / 60,
+                capacity=Config.RATE_LIMIT_BURST,
+            )
+        
+        # Offline-first: remember when the network is down so lookups fail
+        # fast, and replay queued refreshes once it comes back
+        self.connectivity = Connectivity(recheck_after=Config.OFFLINE_RECHECK_INTERVAL)
+        self.connectivity.add_listener(self._on_reconnect)
+        self._pending_refresh: "OrderedDict[tuple, str]" = OrderedDict()
+        self._refresh_listeners: List[Callable[[str, Weather], None]] = []
+        self._probe_task = None
+        self._replay_task = None        # running replay, kept so it isn't collected
+        
+        # One long-lived client so lookups reuse pooled keep-alive connections
+        # instead of paying TCP + TLS setup on every call
+        self._client = client
+        self._owns_client = client is None
+        self.pool_in_use = 0  # requests currently holding a pooled connection
+        
+        # Instrumentation (see metrics.py); None keeps it switched off
+        self.metrics: Optional[MetricsHook] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared connection-pooled HTTP client, created on first use."""
+        if self._client is None or (self._owns_client and self._client.is_closed):
+            self._client = httpx.AsyncClient(
+                # Short connect timeout so a dead network is noticed quickly
+                timeout=httpx.Timeout(self.timeout, connect=Config.CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=Config.MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=Config.KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._owns_client = True
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled client and release its open connections."""
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+        self._client = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    def _convert(self, data: Dict) -> Weather:
+        """Shape a raw API payload the way this service hands readings out."""
+        return WeatherReading.from_api(data) if self.parse_readings else data
+    
+    def _cached(self, key) -> Optional[Weather]:
+        """Look a fresh reading up in memory, then in the persistent store."""
+        data = self.cache.get(key)
+        if data is None and self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                data = self._convert(entry["data"])
+                self.cache.set(key, data, age=time.time() - entry["timestamp"])
+        if self.metrics is not None:
+            self.metrics.on_cache(data is not None)
+        return data
+    
+    def peek(self, city: str, any_age: bool = False) -> Optional[CachedReading]:
+        """
+        Return the cached reading for a city without touching the network.
+        
+        Unlike get_weather, this also returns readings past their TTL (up to
+        Config.MAX_STALE), flagged as stale, for stale-while-revalidate.
+        
+        Args:
+            city: Name of the city
+            any_age: Accept the newest reading the disk store still holds,
+                however old (used when offline)
+            
+        Returns:
+            CachedReading, or None if nothing usable is cached
+        """
+        if not city:
+            return None
+        
+        key = make_key(city=city, units=self.units)
+        hit = self.cache.get_stale(key)
+        if hit is not None:
+            data, age = hit
+            reading = CachedReading(data, age, age > self.cache.ttl)
+        else:
+            reading = self._peek_store(key, any_age)
+        if self.metrics is not None:
+            self.metrics.on_cache(reading is not None)
+        return reading
     
-    async def get_weather(self, city: str) -> Dict:
+    def _peek_store(self, key, any_age: bool) -> Optional[CachedReading]:
+        """The persistent-store half of peek(); promotes hits into memory."""
+        if self.store is None:
+            return None
+        max_stale = None if any_age else Config.MAX_STALE
+        entry = self.store.get(key, max_stale=max_stale)
+        if entry is None:
+            return None
+        age = time.time() - entry["timestamp"]
+        data = self._convert(entry["data"])
+        self.cache.set(key, data, age=age)
+        return CachedReading(data, age, entry["stale"])
+    
+    async def _remember(self, key, data: Dict) -> Weather:
+        """
+        Cache a fresh reading in memory and, off the event loop, on disk.
+        
+        The disk store always keeps the raw payload; memory keeps the
+        converted form. Returns the converted reading.
+        """
+        reading = self._convert(data)
+        self.cache.set(key, reading)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, key, data, Config.CACHE_TTL)
+        return reading
+    
+    async def get_weather(self, city: str, use_cache: bool = True) -> Weather:
         """
         Fetch weather data for a given city.
         
         Args:
             city: Name of the city
+            use_cache: Serve a fresh cached reading if one exists. Pass False
+                to force a network request (the result is still cached).
             
         Returns:
-            Dictionary containing weather data
+            Dictionary containing weather data, or a WeatherReading if the
+            service was created with parse_readings=True
             
         Raises:
             WeatherServiceError: If the request fails
@@ -35,81 +250,429 @@ class WeatherService:
         if not city:
             raise WeatherServiceError("City name cannot be empty")
         
+        key = make_key(city=city, units=self.units)
+        if use_cache:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+        
+        async def fetch():
+            data = await self._fetch_city(city)
+            return await self._remember(key, data)
+        
+        return await self.inflight.do(key, fetch)
+    
+    async def get_weather_offline_first(self, city: str) -> CachedReading:
+        """
+        Fetch fresh weather, falling back to the newest cached reading offline.
+        
+        When the network is down, the cached reading is returned with
+        offline=True and its age, and the city is queued to be refreshed
+        automatically once connectivity returns (see add_refresh_listener).
+        
+        Raises:
+            OfflineError: If offline and nothing is cached for the city
+            WeatherServiceError: If the request fails for another reason
+        """
+        try:
+            data = await self.get_weather(city, use_cache=False)
+            return CachedReading(data, 0.0, False)
+        except OfflineError:
+            cached = self.peek(city, any_age=True)
+            self.queue_refresh(city)
+            if cached is None:
+                raise
+            return cached._replace(offline=True)
+    
+    def add_refresh_listener(self, callback: Callable[[str, Weather], None]):
+        """Call `callback(city, data)` for each queued refresh that completes."""
+        self._refresh_listeners.append(callback)
+    
+    def queue_refresh(self, city: str):
+        """Refresh `city` as soon as the network is reachable again."""
+        self._pending_refresh[make_key(city=city, units=self.units)] = city
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.ensure_future(self._probe())
+    
+    async def _probe(self):
+        """While offline, periodically retry one queued city as a probe."""
+        while self._pending_refresh and not self.connectivity.online:
+            await asyncio.sleep(self.connectivity.recheck_after)
+            city = next(iter(self._pending_refresh.values()))
+            try:
+                await self.get_weather(city, use_cache=False)
+            except WeatherServiceError:
+                pass  # still down (or another error); keep waiting
+    
+    def _on_reconnect(self):
+        if not self._pending_refresh:
+            return
+        if self._replay_task is not None and not self._replay_task.done():
+            return  # the running replay picks up newly queued cities
+        self._replay_task = asyncio.ensure_future(self.replay_pending())
+        self._replay_task.add_done_callback(self._replayed)
+    
+    def _replayed(self, task: asyncio.Task):
+        if self._replay_task is task:
+            self._replay_task = None
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Replaying queued refreshes failed", exc_info=task.exception())
+    
+    async def replay_pending(self):
+        """Refetch every queued city and notify refresh listeners.
+        
+        Cities queued while this runs are refetched too, unless the
+        network drops again.
+        """
+        while self._pending_refresh and self.connectivity.online:
+            cities = list(self._pending_refresh.values())
+            self._pending_refresh.clear()
+            async for result in self.iter_weather_many(cities, use_cache=False):
+                if result.error is None:
+                    for callback in self._refresh_listeners:
+                        callback(result.city, result.data)
+                elif isinstance(result.error, OfflineError):
+                    self.queue_refresh(result.city)  # dropped again mid-replay
+    
+    async def _fetch_city(self, city: str) -> Dict:
+        """Request current weather for a city from the API."""
         # Build request parameters
         params = {
             "q": city,
-            "appid": self.api_key,
-            "units": Config.UNITS,
+            "units": self.units,
         }
         
-        try:
-            # Make async HTTP request
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(self.base_url, params=params)
-                
-                # Check for HTTP errors
-                if response.status_code == 404:
-                    raise WeatherServiceError(
-                        f"City '{city}' not found. Please check the spelling."
-                    )
-                elif response.status_code == 401:
-                    raise WeatherServiceError(
-                        "Invalid API key. Please check your configuration."
-                    )
-                elif response.status_code >= 500:
-                    raise WeatherServiceError(
-                        "Weather service is currently unavailable. "
-                        "Please try again later."
-                    )
-                elif response.status_code != 200:
+        return await self._request(
+            params,
+            not_found=f"City '{city}' not found. Please check the spelling.",
+        )
+    
+    async def _request(
+        self,
+        params: Dict,
+        not_found: str,
+        url: Optional[str] = None,
+        parser: Optional[Callable[[], ForecastParser]] = None,
+    ):
+        """
+        GET an API endpoint with retries and circuit breaking.
+        
+        Timeouts, network errors, 5xx and 429 responses are retried with
+        exponential backoff and jitter (honouring Retry-After on 429/503).
+        Each lookup that still fails counts once towards the circuit breaker.
+        
+        Args:
+            params: Query parameters (the API key is added here)
+            not_found: Error message for a 404
+            url: Endpoint to call (default: the current-weather endpoint)
+            parser: Factory for an incremental parser; if given, the body is
+                fed to it chunk by chunk as it streams in and its close()
+                result is returned instead of the decoded JSON
+        
+        Raises:
+            OfflineError: If the network is unreachable (fails fast while
+                the last connection failure is recent)
+            CircuitOpenError: If the breaker is open and the call was skipped
+            WeatherServiceError: If the request ultimately fails
+        """
+        self._ensure_config()
+        url = url or self.base_url
+        endpoint = url.rstrip("/").rsplit("/", 1)[-1]  # "weather" / "forecast", for metrics
+        params = {**params, "appid": self.api_key}
+        metrics = self.metrics
+        
+        if not self.connectivity.should_attempt():
+            raise OfflineError(
+                "Network error. Please check your internet connection."
+            )
+        
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                "Weather service is temporarily unavailable. "
+                f"Retrying in {self.breaker.retry_in():.0f}s."
+            )
+        
+        attempt = 0
+        while True:
+            retry_after = None
+            
+            # Every attempt, retries included, spends quota
+            if self.limiter is not None:
+                try:
+                    await self.limiter.acquire(max_wait=Config.RATE_LIMIT_MAX_WAIT)
+                except RateLimitExceeded:
                     raise WeatherServiceError(
-                        f"Error fetching weather data: {response.status_code}"
+                        "Too many requests. Please wait a moment and try again."
                     )
+            
+            status = None
+            started = time.perf_counter()
+            self.pool_in_use += 1
+            if metrics is not None:
+                metrics.on_pool(self.pool_in_use)
+            try:
+                # Make async HTTP request over the pooled client; streamed so
+                # a parser can consume the body while it is still arriving
+                async with self.client.stream("GET", url, params=params) as response:
+                    status = response.status_code
+                    self.connectivity.mark_online()
+                    
+                    if response.status_code == 200:
+                        if parser is None:
+                            # Parse JSON response
+                            await response.aread()
+                            data = response.json()
+                        else:
+                            incremental = parser()
+                            async for chunk in response.aiter_bytes():
+                                incremental.feed(chunk)
+                            data = incremental.close()
+                        self.breaker.record_success()
+                        return data
+                    
+                    error = self._status_error(response.status_code, not_found)
+                    retryable = response.status_code == 429 or response.status_code >= 500
+                    if response.status_code in (429, 503):
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
                 
-                # Parse JSON response
-                data = response.json()
-                return data
-                
-        except httpx.TimeoutException:
-            raise WeatherServiceError(
-                "Request timed out. Please check your internet connection."
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # Couldn't reach the host at all: don't retry, don't blame
+                # upstream, and let the next lookups fail fast
+                self.connectivity.mark_offline()
+                raise OfflineError(
+                    "Network error. Please check your internet connection."
+                )
+            except httpx.TimeoutException:
+                error = WeatherServiceError(
+                    "Request timed out. Please check your internet connection."
+                )
+                retryable = True
+            except httpx.NetworkError:
+                error = WeatherServiceError(
+                    "Network error. Please check your internet connection."
+                )
+                retryable = True
+            except httpx.HTTPError as e:
+                error = WeatherServiceError(f"HTTP error occurred: {str(e)}")
+                retryable = False
+            except Exception as e:
+                error = WeatherServiceError(f"An unexpected error occurred: {str(e)}")
+                retryable = False
+            finally:
+                self.pool_in_use -= 1
+                if metrics is not None:
+                    metrics.on_request(endpoint, status, time.perf_counter() - started)
+                    metrics.on_pool(self.pool_in_use)
+            
+            if not retryable:
+                # 404/401 mean upstream is healthy; only outages trip the breaker
+                if isinstance(error, _ClientError):
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                raise error
+            
+            delay = self.retry.delay(attempt, retry_after)
+            if delay is None:
+                self.breaker.record_failure()
+                raise error
+            
+            attempt += 1
+            self.retries += 1
+            if metrics is not None:
+                metrics.on_retry(endpoint, delay)
+            await asyncio.sleep(delay)
+    
+    def _ensure_config(self):
+        """Load and validate configuration before the first request."""
+        if self.api_key is None:
+            try:
+                Config.validate()
+            except ValueError as e:
+                raise WeatherServiceError(str(e))
+            self.api_key = Config.API_KEY
+        if self.base_url is None or self.forecast_url is None:
+            Config.load()
+            self.base_url = self.base_url or Config.BASE_URL
+            self.forecast_url = self.forecast_url or Config.FORECAST_URL
+    
+    @staticmethod
+    def _status_error(status_code: int, not_found: str) -> WeatherServiceError:
+        """Map a non-200 status code to a user-facing error."""
+        if status_code == 404:
+            return _ClientError(not_found)
+        elif status_code == 401:
+            return _ClientError(
+                "Invalid API key. Please check your configuration."
             )
-        except httpx.NetworkError:
-            raise WeatherServiceError(
-                "Network error. Please check your internet connection."
+        elif status_code == 429:
+            return WeatherServiceError(
+                "Too many requests. Please wait a moment and try again."
+            )
+        elif status_code >= 500:
+            return WeatherServiceError(
+                "Weather service is currently unavailable. "
+                "Please try again later."
             )
-        except httpx.HTTPError as e:
-            raise WeatherServiceError(f"HTTP error occurred: {str(e)}")
-        except Exception as e:
-            raise WeatherServiceError(f"An unexpected error occurred: {str(e)}")
+        return _ClientError(f"Error fetching weather data: {status_code}")
+    
+    async def get_weather_many(
+        self,
+        cities: Iterable[str],
+        concurrency: Optional[int] = None,
+        use_cache: bool = True,
+    ) -> List[BatchResult]:
+        """
+        Fetch weather for many cities with bounded concurrency.
+        
+        A failing city is reported in its BatchResult and does not cancel
+        the rest of the batch.
+        
+        Args:
+            cities: City names to look up
+            concurrency: Max simultaneous requests (default Config.BATCH_CONCURRENCY)
+            use_cache: Serve fresh cached readings where available
+            
+        Returns:
+            One BatchResult per city, in input order
+        """
+        semaphore = asyncio.Semaphore(concurrency or Config.BATCH_CONCURRENCY)
+        return await asyncio.gather(
+            *(self._fetch_one(city, semaphore, use_cache) for city in cities)
+        )
+    
+    async def iter_weather_many(
+        self,
+        cities: Iterable[str],
+        concurrency: Optional[int] = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Like get_weather_many, but yield each BatchResult as soon as it completes.
+        
+        Usage:
+            async for result in service.iter_weather_many(cities):
+                ...
+        """
+        semaphore = asyncio.Semaphore(concurrency or Config.BATCH_CONCURRENCY)
+        tasks = [
+            asyncio.ensure_future(self._fetch_one(city, semaphore, use_cache))
+            for city in cities
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Consumer stopped early: don't leave requests running
+            for task in tasks:
+                task.cancel()
+    
+    async def _fetch_one(
+        self,
+        city: str,
+        semaphore: asyncio.Semaphore,
+        use_cache: bool,
+    ) -> BatchResult:
+        """Fetch one city of a batch, capturing its error instead of raising."""
+        async with semaphore:
+            try:
+                data = await self.get_weather(city, use_cache=use_cache)
+                return BatchResult(city, data, None)
+            except WeatherServiceError as e:
+                return BatchResult(city, None, e)
     
     async def get_weather_by_coordinates(
         self, 
         lat: float, 
-        lon: float
-    ) -> Dict:
+        lon: float,
+        use_cache: bool = True,
+    ) -> Weather:
         """
         Fetch weather data by coordinates.
         
         Args:
             lat: Latitude
             lon: Longitude
+            use_cache: Serve a fresh cached reading if one exists
             
         Returns:
-            Dictionary containing weather data
+            Dictionary containing weather data (or a WeatherReading)
         """
+        key = make_key(
+            lat=lat, lon=lon, units=self.units,
+            precision=Config.CACHE_COORD_PRECISION,
+        )
+        if use_cache:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+        
+        async def fetch():
+            data = await self._fetch_coordinates(lat, lon)
+            return await self._remember(key, data)
+        
+        return await self.inflight.do(key, fetch)
+    
+    async def _fetch_coordinates(self, lat: float, lon: float) -> Dict:
+        """Request current weather for a coordinate pair from the API."""
         params = {
             "lat": lat,
             "lon": lon,
-            "appid": self.api_key,
-            "units": Config.UNITS,
+            "units": self.units,
         }
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(self.base_url, params=params)
-                response.raise_for_status()
-                return response.json()
-                
-        except Exception as e:
-            raise WeatherServiceError(f"Error fetching weather data: {str(e)}")
\ No newline at end of file
+        return await self._request(
+            params,
+            not_found=f"No weather data found for ({lat}, {lon}).",
+        )
+    
+    async def get_forecast(self, city: str, use_cache: bool = True) -> Forecast:
+        """
+        Fetch the 5-day/3-hour forecast for a city.
+        
+        The response is parsed as it streams in, straight into a columnar
+        Forecast; the raw payload is never kept. Forecasts are cached in
+        memory only.
+        
+        Args:
+            city: Name of the city
+            use_cache: Serve a fresh cached forecast if one exists
+            
+        Returns:
+            Forecast with one array per field and a value per timestep
+            
+        Raises:
+            WeatherServiceError: If the request fails
+        """
+        if not city:
+            raise WeatherServiceError("City name cannot be empty")
+        
+        key = ("forecast",) + make_key(city=city, units=self.units)
+        if use_cache:
+            cached = self.cache.get(key)
+            if self.metrics is not None:
+                self.metrics.on_cache(cached is not None)
+            if cached is not None:
+                return cached
+        
+        async def fetch():
+            forecast = await self._fetch_forecast(city)
+            self.cache.set(key, forecast)
+            return forecast
+        
+        return await self.inflight.do(key, fetch)
+    
+    async def _fetch_forecast(self, city: str) -> Forecast:
+        """Request and incrementally parse the forecast for a city."""
+        self._ensure_config()
+        params = {
+            "q": city,
+            "units": self.units,
+        }
+        
+        return await self._request(
+            params,
+            not_found=f"City '{city}' not found. Please check the spelling.",
+            url=self.forecast_url,
+            parser=lambda: ForecastParser(units=self.units),
+        )
\ No newline at end of file
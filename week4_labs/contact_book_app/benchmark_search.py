@@ -0,0 +1,147 @@
+"""Per-keystroke search latency of the contact book database layer.
+
+Run with:
+    python benchmark_search.py [contacts]
+
+Fills a throwaway database with fake contacts, then types a few names
+one letter at a time and times the query each keystroke triggers: the
+old reconnect-per-query LIKE scan of every row, and the first page the
+app now fetches, with LIKE and with the FTS5 index. Then it times
+scrolling through the pages of each query.
+"""
+
+import os
+import random
+import sqlite3
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from database import add_contact_db, get_contacts_page_db, init_db, page_key, search_ranked_db
+
+QUERIES = ["john", "maria", "555", "gmail", "zed"]
+
+
+def legacy_search(path, search=""):
+    """The old get_all_contacts_db: reconnect, re-create the table, query, close."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "name TEXT NOT NULL, phone TEXT, email TEXT)"
+    )
+    conn.commit()
+    if search:
+        wildcard = f"%{search}%"
+        rows = conn.execute(
+            "SELECT id, name, phone, email FROM contacts "
+            "WHERE name LIKE ? OR phone LIKE ? OR email LIKE ?",
+            (wildcard, wildcard, wildcard),
+        ).fetchall()
+    else:
+        rows = conn.execute("SELECT id, name, phone, email FROM contacts").fetchall()
+    conn.close()
+    return rows
+
+
+def fake_name(rng):
+    """A common first name now and then, otherwise a made-up one."""
+    common = ["John", "Maria", "Wei", "Aisha", "Carlos", "Yuki", "Olga", "Zed", "Priya", "Tom"]
+    syllables = ["ka", "lo", "mi", "ra", "to", "ne", "su", "vi", "de", "an", "el", "or", "ba", "ji"]
+
+    def made_up():
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).capitalize()
+
+    first = rng.choice(common) if rng.random() < 0.1 else made_up()
+    return f"{first} {made_up()}"
+
+
+def fill(conn, count):
+    rng = random.Random(0)
+    domains = ["gmail.com", "yahoo.com", "example.org", "mail.ph"]
+    with conn.lock, conn:
+        conn.executemany(
+            "INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)",
+            (
+                (
+                    fake_name(rng),
+                    "".join(rng.choice(string.digits) for _ in range(10)),
+                    f"user{i}@{rng.choice(domains)}",
+                )
+                for i in range(count)
+            ),
+        )
+
+
+def keystrokes():
+    """Every prefix of every query, as typed."""
+    for query in QUERIES:
+        for i in range(1, len(query) + 1):
+            yield query[:i]
+
+
+def time_search(search, rounds=5):
+    timings = []
+    for _ in range(rounds):
+        for text in keystrokes():
+            start = time.perf_counter()
+            search(text)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def time_scroll(conn, pages=20):
+    """Every page after the first, up to `pages` of them, for each full query."""
+    timings = []
+    for query in QUERIES:
+        ranked = search_ranked_db(conn, query)       # decided once, as the app does
+        rows = get_contacts_page_db(conn, query, ranked=ranked)
+        for _ in range(pages):
+            if not rows:
+                break
+            start = time.perf_counter()
+            rows = get_contacts_page_db(conn, query, page_key(rows[-1]), ranked=ranked)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def without_fts(conn, search):
+    conn.fts = False
+    try:
+        return get_contacts_page_db(conn, search)
+    finally:
+        conn.fts = True
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<24} median {statistics.median(timings):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "contacts.db")
+        conn = init_db(path)
+        fill(conn, count)
+        add_contact_db(conn, "Benchmark Person", "0000000000", "bench@example.org")
+
+        print(f"Search latency per keystroke, {count} contacts\n")
+        report("reconnect + LIKE (old)", time_search(lambda q: legacy_search(path, q)))
+        if conn.fts:
+            report("first page, LIKE", time_search(lambda q: without_fts(conn, q)))
+            report("first page, FTS5", time_search(lambda q: get_contacts_page_db(conn, q)))
+            report("next pages, FTS5", time_scroll(conn))
+        else:
+            print("  (SQLite built without FTS5; full-text search unavailable)")
+            report("first page, LIKE", time_search(lambda q: get_contacts_page_db(conn, q)))
+            report("next pages, LIKE", time_scroll(conn))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,266 @@
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+
 import flet as ft
-from database import update_contact_db, delete_contact_db, add_contact_db, get_all_contacts_db
+from database import (
+    update_contact_db, delete_contact_db, add_contact_db, get_contact_db, get_contacts_page_db, page_key,
+    search_ranked_db, PAGE_SIZE,
+)
 
-def display_contacts(page, contacts_list_view, db_conn, search):
-    """Fetches and displays all contacts in the ListView."""
-    contacts_list_view.controls.clear()
-    contacts = get_all_contacts_db(search)
-
-    for contact in contacts:
-        contact_id, name, phone, email = contact
-
-        contacts_list_view.controls.append(
-            ft.Card(
-                elevation=4,
-                margin=10,
-                content=ft.Container(
-                    padding=15,
-                    content=ft.Row(
-                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                        vertical_alignment=ft.CrossAxisAlignment.START,
+MAX_CARDS = 300       # cards kept in the ListView; the far end is dropped past this
+SCROLL_MARGIN = 400   # px from either end of the list at which the next page loads
+SEARCH_DEBOUNCE_MS = 200  # quiet time after a keystroke before the search runs
+
+class ContactPager:
+    """Which slice of the contact list is on screen; kept in the ListView's data.
+
+    keys holds the keyset pagination key of each card, in the same order
+    as the ListView's controls. ranked is decided when the first page
+    loads and used for every later query, so all keys share one order.
+    """
+
+    def __init__(self, search="", ranked=False, page_size=PAGE_SIZE, max_cards=MAX_CARDS):
+        self.search = search
+        self.ranked = ranked
+        self.page_size = page_size
+        self.max_cards = max_cards
+        self.keys = []
+        self.at_start = True
+        self.at_end = False
+        self.card_extent = None  # average px per card, measured while scrolling
+        self.loading = False     # a page is being fetched; only one at a time
+        # Flet runs handlers in worker threads (and searches on the event
+        # loop), so keys and the ListView's controls change under this lock.
+        # It is never held across a query or page.update()
+        self.lock = threading.Lock()
+
+def contact_card(page, contact, db_conn, contacts_list_view):
+    """Builds the card for one contact."""
+    contact_id, name, phone, email = contact
+    return ft.Card(
+        elevation=4,
+        margin=10,
+        content=ft.Container(
+            padding=15,
+            content=ft.Row(
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                vertical_alignment=ft.CrossAxisAlignment.START,
+                controls=[
+                    # Left side: contact details
+                    ft.Column(
+                        spacing=5,
+                        alignment=ft.MainAxisAlignment.START,
                         controls=[
-                            # Left side: contact details
-                            ft.Column(
-                                spacing=5,
-                                alignment=ft.MainAxisAlignment.START,
-                                controls=[
-                                    ft.Text(name, size=16, weight=ft.FontWeight.BOLD),
-                                    ft.Row(
-                                        [ft.Icon(ft.Icons.PHONE, size=16, color=ft.Colors.BLUE),
-                                         ft.Text(phone, size=14)],
-                                        spacing=8,
-                                    ),
-                                    ft.Row(
-                                        [ft.Icon(ft.Icons.EMAIL, size=16, color=ft.Colors.RED),
-                                         ft.Text(email, size=14)],
-                                        spacing=8,
-                                    ),
-                                ],
+                            ft.Text(name, size=16, weight=ft.FontWeight.BOLD),
+                            ft.Row(
+                                [ft.Icon(ft.Icons.PHONE, size=16, color=ft.Colors.BLUE),
+                                 ft.Text(phone, size=14)],
+                                spacing=8,
                             ),
-                            # Right side: menu button
-                            ft.PopupMenuButton(
-                                icon=ft.Icons.MORE_VERT,
-                                items=[
-                                    ft.PopupMenuItem(
-                                        text="Edit",
-                                        icon=ft.Icons.EDIT,
-                                        on_click=lambda _, c=contact: open_edit_dialog(page, c, db_conn, contacts_list_view)
-                                    ),
-                                    ft.PopupMenuItem(),  # separator
-                                    ft.PopupMenuItem(
-                                        text="Delete",
-                                        icon=ft.Icons.DELETE,
-                                        on_click=lambda _, cid=contact_id: delete_contact(page, cid, db_conn, contacts_list_view)
-                                    ),
-                                ],
+                            ft.Row(
+                                [ft.Icon(ft.Icons.EMAIL, size=16, color=ft.Colors.RED),
+                                 ft.Text(email, size=14)],
+                                spacing=8,
                             ),
                         ],
                     ),
-                ),
-            )
-        )
-    page.update()
+                    # Right side: menu button
+                    ft.PopupMenuButton(
+                        icon=ft.Icons.MORE_VERT,
+                        items=[
+                            ft.PopupMenuItem(
+                                text="Edit",
+                                icon=ft.Icons.EDIT,
+                                on_click=lambda _, c=contact: open_edit_dialog(page, c, db_conn, contacts_list_view)
+                            ),
+                            ft.PopupMenuItem(),  # separator
+                            ft.PopupMenuItem(
+                                text="Delete",
+                                icon=ft.Icons.DELETE,
+                                on_click=lambda _, cid=contact_id: delete_contact(page, cid, db_conn, contacts_list_view)
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+        ),
+    )
+
+def display_contacts(page, contacts_list_view, db_conn, search):
+    """Shows the first page of contacts (or of those matching `search`) in the ListView."""
+    ranked, rows = fetch_contacts(db_conn, search)
+    show_contacts(page, contacts_list_view, db_conn, search, rows, ranked)
+
+def fetch_contacts(db_conn, search, cancelled=None):
+    """Decides how `search` is ordered and fetches its first page: (ranked, rows).
+
+    rows is None if `cancelled` was set (see get_contacts_page_db).
+    """
+    ranked = search_ranked_db(db_conn, search)
+    return ranked, get_contacts_page_db(db_conn, search, cancelled=cancelled, ranked=ranked)
+
+def show_contacts(page, contacts_list_view, db_conn, search, rows, ranked=False):
+    """Replaces the ListView's contents with `rows`, the first page for `search`."""
+    old = contacts_list_view.data
+    pager = ContactPager(search, ranked)
+    # Called on the event loop: the old lock is only ever held briefly,
+    # and a page still loading for the old pager is discarded
+    with old.lock if old else nullcontext():
+        contacts_list_view.data = pager
+        contacts_list_view.controls.clear()
+        with pager.lock:
+            shift = add_page(page, contacts_list_view, db_conn, rows)
+    render_page(page, contacts_list_view, shift)
+
+def load_page(page, contacts_list_view, db_conn, backward=False):
+    """Fetches and shows the next page of cards (or the previous one)."""
+    pager = contacts_list_view.data
+    with pager.lock:
+        done = pager.at_start if backward else pager.at_end
+        if pager.loading or done:
+            return
+        pager.loading = True
+        key = None
+        if pager.keys:
+            key = pager.keys[0] if backward else pager.keys[-1]
+    try:
+        rows = get_contacts_page_db(db_conn, pager.search, key, backward, pager.page_size, ranked=pager.ranked)
+    finally:
+        with pager.lock:
+            pager.loading = False
+    with pager.lock:
+        edge = None
+        if pager.keys:
+            edge = pager.keys[0] if backward else pager.keys[-1]
+        if contacts_list_view.data is not pager or edge != key:
+            return  # a new search, or an edit at this edge; the next scroll reloads
+        shift = add_page(page, contacts_list_view, db_conn, rows, backward)
+    render_page(page, contacts_list_view, shift)
+
+def add_page(page, contacts_list_view, db_conn, rows, backward=False):
+    """Appends a page of cards (or prepends the previous one); the caller holds the pager's lock.
+
+    Cards beyond the pager's max_cards are dropped from the other end and
+    fetched again if the user scrolls back to them. Returns the number of
+    cards added (+) or dropped (-) above the existing ones, for render_page.
+    """
+    pager = contacts_list_view.data
+    if len(rows) < pager.page_size:
+        if backward:
+            pager.at_start = True
+        else:
+            pager.at_end = True
+    if not rows:
+        return 0
+
+    cards = [contact_card(page, row[:4], db_conn, contacts_list_view) for row in rows]
+    keys = [page_key(row) for row in rows]
+    controls = contacts_list_view.controls
+    excess = len(controls) + len(cards) - pager.max_cards
+    if backward:
+        controls[:0] = cards
+        pager.keys[:0] = keys
+        if excess > 0:
+            del controls[-excess:], pager.keys[-excess:]
+            pager.at_end = False
+        shift = len(cards)
+    else:
+        controls.extend(cards)
+        pager.keys.extend(keys)
+        if excess > 0:
+            del controls[:excess], pager.keys[:excess]
+            pager.at_start = False
+        shift = -max(excess, 0)
+    return shift
+
+def render_page(page, contacts_list_view, shift):
+    """Sends the ListView to the client after add_page, without the pager's lock held."""
+    page.update(contacts_list_view)
+    # Cards added or dropped above the viewport move everything below
+    # them; scroll by the same amount so the visible cards stay put
+    card_extent = contacts_list_view.data.card_extent
+    if shift and card_extent:
+        contacts_list_view.scroll_to(delta=shift * card_extent, duration=0)
+
+def handle_scroll(page, contacts_list_view, db_conn, e):
+    """Loads another page when the ListView is scrolled near either end."""
+    pager = contacts_list_view.data
+    if pager is None or e.max_scroll_extent is None:
+        return
+    if contacts_list_view.controls:
+        pager.card_extent = (e.max_scroll_extent + e.viewport_dimension) / len(contacts_list_view.controls)
+    if e.pixels >= e.max_scroll_extent - SCROLL_MARGIN:
+        load_page(page, contacts_list_view, db_conn)
+    elif e.pixels <= e.min_scroll_extent + SCROLL_MARGIN:
+        load_page(page, contacts_list_view, db_conn, backward=True)
+
+def find_card(contacts_list_view, contact_id):
+    """Index of the card showing `contact_id`, or None if it isn't loaded."""
+    for i, (_, card_id) in enumerate(contacts_list_view.data.keys):
+        if card_id == contact_id:
+            return i
+    return None
+
+def refresh_card(page, contacts_list_view, db_conn, contact_id):
+    """Inserts, replaces, moves or removes one contact's card to match the database.
+
+    Only that card changes, and only if it falls within the loaded pages;
+    the active search is kept. The caller updates contacts_list_view.
+    """
+    pager = contacts_list_view.data
+    row = get_contact_db(db_conn, contact_id, pager.search, pager.ranked)
+    with pager.lock:
+        if contacts_list_view.data is not pager:
+            return  # a new search replaced the list while the row was fetched
+        controls = contacts_list_view.controls
+        old = find_card(contacts_list_view, contact_id)
+        if old is not None:
+            del controls[old], pager.keys[old]
+        if row is None:
+            return  # deleted, or no longer matches the search
+
+        key = page_key(row)
+        i = bisect_left(pager.keys, key)
+        # At either edge of the loaded pages the card may belong to a page
+        # that isn't loaded; it shows up when that page is
+        outside = (i == 0 and not pager.at_start) or (i == len(pager.keys) and not pager.at_end)
+        if outside and i != old:
+            return
+        controls.insert(i, contact_card(page, row[:4], db_conn, contacts_list_view))
+        pager.keys.insert(i, key)
+        if len(controls) > pager.max_cards:
+            # Drop a card from the end farther from the new one, never the new one
+            if i < len(controls) // 2:
+                del controls[-1], pager.keys[-1]
+                pager.at_end = False
+            else:
+                del controls[0], pager.keys[0]
+                pager.at_start = False
 
 def add_contact(page, inputs, contacts_list_view, db_conn):
-    """Adds a new contact and refreshes the list."""
+    """Adds a new contact and shows its card."""
     name_input, phone_input, email_input = inputs
     name_input.error_text = None
     if not name_input.value:
         name_input.error_text = "Name cannot be empty" 
         page.update()
         return
-    add_contact_db(db_conn, name_input.value, phone_input.value, email_input.value)
+    contact_id = add_contact_db(db_conn, name_input.value, phone_input.value, email_input.value)
         
     for field in inputs:
         field.value = ""
-    display_contacts(page, contacts_list_view, db_conn, "")
-    page.update()
+    refresh_card(page, contacts_list_view, db_conn, contact_id)
+    page.update(contacts_list_view, *inputs)
 
 def delete_contact(page, contact_id, db_conn, contacts_list_view):
-    """Deletes a contact and refreshes the list."""
+    """Deletes a contact and removes its card."""
     def confirm_delete(e):
         delete_contact_db(db_conn, contact_id)
-        display_contacts(page, contacts_list_view, db_conn, "")
+        refresh_card(page, contacts_list_view, db_conn, contact_id)
         
         confirmation_dialog.open = False
-        page.update()
+        page.update(contacts_list_view, confirmation_dialog)
 
 
     confirmation_dialog = ft.AlertDialog(
@@ -106,8 +283,8 @@ def open_edit_dialog(page, contact, db_conn, contacts_list_view):
     def save_and_close(e):
         update_contact_db(db_conn, contact_id, edit_name.value, edit_phone.value, edit_email.value)
         dialog.open = False
-        page.update()
-        display_contacts(page, contacts_list_view, db_conn, "")
+        refresh_card(page, contacts_list_view, db_conn, contact_id)
+        page.update(contacts_list_view, dialog)
     dialog = ft.AlertDialog(
         modal=True,
         title=ft.Text("Edit Contact"),
@@ -1,10 +1,141 @@
+import re
 import sqlite3
+import threading
 
-def init_db():
-    """Initializes the database and creates the contacts table if it doesn't exist."""
-    conn = sqlite3.connect('contacts.db', check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('''
+DB_FILE = "contacts.db"
+SCHEMA_VERSION = 1  # 1: contacts_fts full-text index
+
+# SQL kept as constants: sqlite3 caches each compiled statement per
+# connection, keyed by its text, so every call after the first reuses it
+INSERT_CONTACT = "INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)"
+
+# Keyset pagination: each page continues from the (score, id) key of the
+# last row shown instead of using OFFSET, so page 1000 is as cheap as page 1.
+# score is bm25 for a full-text search with at most RANK_LIMIT matches
+# (lower is better) and 0 otherwise; broader searches page in id order.
+# Each pair is (forward, backward); backward pages come out in reverse.
+PAGE_ALL = (
+    "SELECT id, name, phone, email, 0.0 FROM contacts WHERE id > ? ORDER BY id LIMIT ?",
+    "SELECT id, name, phone, email, 0.0 FROM contacts WHERE id < ? ORDER BY id DESC LIMIT ?",
+)
+PAGE_MATCHING = tuple(
+    f"""
+    SELECT id, name, phone, email, 0.0
+    FROM contacts
+    WHERE id {op} ? AND (name LIKE ? OR phone LIKE ? OR email LIKE ?)
+    ORDER BY id {order}
+    LIMIT ?
+    """
+    for op, order in ((">", "ASC"), ("<", "DESC"))
+)
+PAGE_FTS_BY_ID = tuple(
+    f"""
+    SELECT c.id, c.name, c.phone, c.email, 0.0
+    FROM contacts_fts
+    JOIN contacts AS c ON c.id = contacts_fts.rowid
+    WHERE contacts_fts MATCH ? AND contacts_fts.rowid {op} ?
+    ORDER BY contacts_fts.rowid {order}
+    LIMIT ?
+    """
+    for op, order in ((">", "ASC"), ("<", "DESC"))
+)
+# Ranking sorts every match, so it is only done for searches with at most
+# RANK_LIMIT matches; that bounds the cost of each page. bm25 weights per
+# column: a hit in the name counts most, then phone, then email
+PAGE_FTS = tuple(
+    f"""
+    SELECT id, name, phone, email, score FROM (
+        SELECT c.id, c.name, c.phone, c.email, bm25(contacts_fts, 10.0, 5.0, 1.0) AS score
+        FROM contacts_fts
+        JOIN contacts AS c ON c.id = contacts_fts.rowid
+        WHERE contacts_fts MATCH ?
+    )
+    WHERE (score, id) {op} (?, ?)
+    ORDER BY score {order}, id {order}
+    LIMIT ?
+    """
+    for op, order in ((">", "ASC"), ("<", "DESC"))
+)
+PAGE_SIZE = 50
+RANK_LIMIT = 1000
+COUNT_MATCHES = """
+    SELECT count(*) FROM (SELECT 1 FROM contacts_fts WHERE contacts_fts MATCH ? LIMIT ?)
+"""
+# One contact, as a page row, if it matches the search (see get_contact_db)
+SELECT_ONE = "SELECT id, name, phone, email, 0.0 FROM contacts WHERE id = ?"
+SELECT_ONE_MATCHING = """
+    SELECT id, name, phone, email, 0.0
+    FROM contacts
+    WHERE id = ? AND (name LIKE ? OR phone LIKE ? OR email LIKE ?)
+"""
+SELECT_ONE_FTS = """
+    SELECT c.id, c.name, c.phone, c.email, bm25(contacts_fts, 10.0, 5.0, 1.0)
+    FROM contacts_fts
+    JOIN contacts AS c ON c.id = contacts_fts.rowid
+    WHERE contacts_fts MATCH ? AND contacts_fts.rowid = ?
+"""
+UPDATE_CONTACT = "UPDATE contacts SET name = ?, phone = ?, email = ? WHERE id = ?"
+DELETE_CONTACT = "DELETE FROM contacts WHERE id = ?"
+
+
+# External-content FTS5 index over contacts, kept in sync by triggers.
+# prefix='1 2 3' indexes short prefixes so "jo*" doesn't scan every token.
+CREATE_FTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+        name, phone, email,
+        content='contacts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='1 2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contacts_ai AFTER INSERT ON contacts BEGIN
+        INSERT INTO contacts_fts(rowid, name, phone, email)
+        VALUES (new.id, new.name, new.phone, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contacts_ad AFTER DELETE ON contacts BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, name, phone, email)
+        VALUES ('delete', old.id, old.name, old.phone, old.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contacts_au AFTER UPDATE ON contacts BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, name, phone, email)
+        VALUES ('delete', old.id, old.name, old.phone, old.email);
+        INSERT INTO contacts_fts(rowid, name, phone, email)
+        VALUES (new.id, new.name, new.phone, new.email);
+    END
+    """,
+]
+
+
+class ContactsConnection(sqlite3.Connection):
+    """A sqlite3 connection with a lock.
+
+    Flet runs event handlers in worker threads, so the one shared
+    connection is only ever used by one thread at a time. `fts` tells
+    whether the full-text index is available.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.RLock()
+        self.fts = False
+
+
+def init_db(path=DB_FILE):
+    """Opens the database (once per app) and creates the contacts table if it doesn't exist."""
+    conn = sqlite3.connect(
+        path,
+        check_same_thread=False,
+        factory=ContactsConnection,
+        cached_statements=64,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
     CREATE TABLE IF NOT EXISTS contacts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL,
@@ -13,47 +144,147 @@ def init_db():
     )
     ''')
     conn.commit()
+    conn.fts = migrate_fts(conn)
     return conn
 
+def migrate_fts(conn):
+    """Creates the full-text index and fills it from existing contacts, once.
+
+    Returns False (search falls back to LIKE) if SQLite was built without FTS5.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return True
+    try:
+        with conn:
+            for statement in CREATE_FTS:
+                conn.execute(statement)
+            # Index every contact already in an older contacts.db
+            conn.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except sqlite3.OperationalError as e:
+        if "no such module: fts5" not in str(e):
+            raise
+        return False
+    return True
+
+def fts_query(search):
+    """Turns what the user typed into an FTS5 query: every word, as a prefix.
+
+    Each word is quoted, so characters like '"', '-' or '*' are matched
+    literally instead of being parsed as FTS syntax.
+    """
+    words = re.findall(r"\w+", search)
+    return " ".join(f'"{word}"*' for word in words)
+
 def add_contact_db(conn, name, phone, email):
-    """Adds a new contact to the database."""
-    cursor = conn.cursor()
-    cursor.execute(
-    "INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)",
-    (name, phone, email)
-    )
-    conn.commit()
+    """Adds a new contact to the database and returns its id."""
+    with conn.lock, conn:
+        return conn.execute(INSERT_CONTACT, (name, phone, email)).lastrowid
+
+def search_ranked_db(conn, search):
+    """Whether the full-text matches for `search` are few enough (RANK_LIMIT) to rank.
+
+    Decide this once per listing and pass it to every get_contacts_page_db
+    and get_contact_db call for it: keys from ranked and id-ordered pages
+    don't mix, and adding or deleting contacts can move the count across
+    the limit mid-listing.
+    """
+    query = fts_query(search) if search and conn.fts else ""
+    if not query:
+        return False
+    with conn.lock:
+        return _ranked(conn, query)
+
+def get_contacts_page_db(conn, search="", key=None, backward=False, limit=PAGE_SIZE, cancelled=None,
+                         ranked=None):
+    """Retrieves one page of contacts (or of those matching `search`).
+
+    Full-text matches come best first if `ranked` (see search_ranked_db;
+    None decides now), and in id order otherwise.
+
+    Rows are (id, name, phone, email, score) in display order; pass
+    page_key() of the last row to get the next page, or of the first row
+    with backward=True to get the one before it. key=None starts at the
+    beginning (or, backward, at the end).
 
-def get_all_contacts_db(search=""):
-    """Retrieves all contacts from the database."""
-    conn = init_db()
-    cursor = conn.cursor()
-    if search:
-        query = """ 
-            SELECT id, name, phone, email 
-            FROM contacts 
-            WHERE name LIKE ? OR phone LIKE ? OR email LIKE ?
-            """
+    `cancelled` is an optional threading.Event; setting it aborts the
+    query, even mid-scan, and None is returned instead of rows.
+    """
+    with conn.lock:
+        if cancelled is None:
+            return _get_page(conn, search, key, backward, limit, ranked)
+        if cancelled.is_set():
+            return None
+        # SQLite calls this every 1000 VM instructions; True aborts the statement.
+        # Unlike conn.interrupt() it can't hit another thread's write.
+        conn.set_progress_handler(cancelled.is_set, 1000)
+        try:
+            return _get_page(conn, search, key, backward, limit, ranked)
+        except sqlite3.OperationalError:
+            if cancelled.is_set():
+                return None
+            raise
+        finally:
+            conn.set_progress_handler(None, 1000)
+
+def _get_page(conn, search, key, backward, limit, ranked):
+    """get_contacts_page_db without the locking and cancellation."""
+    index = 1 if backward else 0
+    query = fts_query(search) if search and conn.fts else ""
+    last_id = key[1] if key else (2**63 - 1 if backward else -1)
+    if query and ranked is None:
+        ranked = _ranked(conn, query)
+    if query and ranked:
+        score, last_id = key or ((float("inf"), 0) if backward else (float("-inf"), 0))
+        rows = conn.execute(PAGE_FTS[index], (query, score, last_id, limit)).fetchall()
+    elif query:
+        rows = conn.execute(PAGE_FTS_BY_ID[index], (query, last_id, limit)).fetchall()
+    elif search:
         wildcard = f"%{search}%"
-        cursor.execute(query,(wildcard, wildcard, wildcard))
+        params = (last_id, wildcard, wildcard, wildcard, limit)
+        rows = conn.execute(PAGE_MATCHING[index], params).fetchall()
     else:
-        cursor.execute("SELECT id, name, phone, email FROM contacts")
-    
-    rows = cursor.fetchall()
-    conn.close()
+        rows = conn.execute(PAGE_ALL[index], (last_id, limit)).fetchall()
+    if backward:
+        rows.reverse()
     return rows
 
+def _ranked(conn, query):
+    """Whether a full-text search has few enough matches to rank them all."""
+    return conn.execute(COUNT_MATCHES, (query, RANK_LIMIT + 1)).fetchone()[0] <= RANK_LIMIT
+
+def get_contact_db(conn, contact_id, search="", ranked=None):
+    """Retrieves one contact as a get_contacts_page_db row, keyed like its pages.
+
+    Returns None if it doesn't exist or doesn't match `search`.
+    """
+    with conn.lock:
+        query = fts_query(search) if search and conn.fts else ""
+        if query:
+            if ranked is None:
+                ranked = _ranked(conn, query)
+            row = conn.execute(SELECT_ONE_FTS, (query, contact_id)).fetchone()
+            if row is not None and not ranked:
+                row = row[:4] + (0.0,)  # keyed like the id-ordered pages
+            return row
+        if search:
+            wildcard = f"%{search}%"
+            cursor = conn.execute(SELECT_ONE_MATCHING, (contact_id, wildcard, wildcard, wildcard))
+        else:
+            cursor = conn.execute(SELECT_ONE, (contact_id,))
+        return cursor.fetchone()
+
+def page_key(row):
+    """The keyset pagination key of a row from get_contacts_page_db."""
+    return row[4], row[0]
+
 def update_contact_db(conn, contact_id, name, phone, email):
     """Updates an existing contact in the database."""
-    cursor = conn.cursor()
-    cursor.execute(
-    "UPDATE contacts SET name = ?, phone = ?, email = ? WHERE id = ?",
-    (name, phone, email, contact_id)
-    )
-    conn.commit()
+    with conn.lock, conn:
+        conn.execute(UPDATE_CONTACT, (name, phone, email, contact_id))
 
 def delete_contact_db(conn, contact_id):
     """Deletes a contact from the database."""
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM contacts WHERE id = ?", (contact_id,))
-    conn.commit()
+    with conn.lock, conn:
+        conn.execute(DELETE_CONTACT, (contact_id,))
@@ -1,6 +1,9 @@
+import asyncio
+import threading
+
 import flet as ft
 from database import init_db
-from app_logic import display_contacts, add_contact
+from app_logic import display_contacts, fetch_contacts, show_contacts, add_contact, handle_scroll, SEARCH_DEBOUNCE_MS
 
 def main(page: ft.Page):
     page.title = "Contact Book"
@@ -23,8 +26,28 @@ def main(page: ft.Page):
     )
 
     db_conn = init_db()
-    def search_pattern(e):
-        display_contacts(page, contacts_list_view, db_conn, search_input.value)
+    search_task = None  # pending debounced search
+
+    async def search_pattern(e):
+        """Restarts the search on every keystroke (debounced)."""
+        nonlocal search_task
+        if search_task is not None:
+            search_task.cancel()
+        search_task = asyncio.create_task(run_search(search_input.value or ""))
+
+    async def run_search(search):
+        """Searches once typing pauses; a newer keystroke cancels it at any point."""
+        await asyncio.sleep(SEARCH_DEBOUNCE_MS / 1000)
+        cancelled = threading.Event()
+        try:
+            ranked, rows = await asyncio.to_thread(fetch_contacts, db_conn, search, cancelled)
+        except asyncio.CancelledError:
+            cancelled.set()  # stop the query still running in its thread
+            raise
+        # Nothing can cancel us between here and the render, so only the
+        # latest search is ever shown
+        if rows is not None:
+            show_contacts(page, contacts_list_view, db_conn, search, rows, ranked)
 
     search_input = ft.TextField(label="Search...", on_change=search_pattern, width=350)
     name_input = ft.TextField(label="Name", width=350)
@@ -33,7 +56,14 @@ def main(page: ft.Page):
 
     inputs = (name_input, phone_input, email_input)
 
-    contacts_list_view = ft.ListView(expand=True, spacing=10, auto_scroll=True)
+    # Contacts load a page at a time as the list nears either end (see app_logic)
+    contacts_list_view = ft.ListView(
+        expand=True,
+        spacing=10,
+        auto_scroll=False,
+        on_scroll_interval=50,
+        on_scroll=lambda e: handle_scroll(page, contacts_list_view, db_conn, e),
+    )
     
     add_button = ft.ElevatedButton(
     text="Add Contact",
@@ -0,0 +1,332 @@
+"""Simple tests for the contact book database layer and list logic.
+
+Run with:
+    python test_contacts.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import flet as ft
+from app_logic import display_contacts, fetch_contacts, load_page, refresh_card, show_contacts
+from database import (
+    RANK_LIMIT, SCHEMA_VERSION, add_contact_db, delete_contact_db, get_contacts_page_db, init_db,
+    page_key, search_ranked_db, update_contact_db,
+)
+
+
+def make_db(count=0):
+    """A fresh contacts database in a temp dir, with `count` numbered contacts."""
+    path = os.path.join(tempfile.mkdtemp(), "contacts.db")
+    conn = init_db(path)
+    for i in range(1, count + 1):
+        add_contact_db(conn, f"Person {i}", f"555{i:04d}", f"person{i}@example.org")
+    return conn, path
+
+
+def make_list(conn, search="", max_cards=300):
+    """A ListView holding the first page for `search`, as display_contacts builds it.
+
+    The page is a stand-in: the list logic only ever calls its update().
+    """
+    page = types.SimpleNamespace(update=lambda *controls: None)
+    view = ft.ListView()
+    display_contacts(page, view, conn, search)
+    view.data.max_cards = max_cards
+    return page, view
+
+
+def scroll_to_end(page, view, conn):
+    while not view.data.at_end:
+        load_page(page, view, conn)
+
+
+def card_ids(view):
+    return [card_id for _, card_id in view.data.keys]
+
+
+def walk_pages(conn, search, backward=False, limit=7):
+    """Every row for `search`, fetched page by page in one direction."""
+    rows, key = [], None
+    ranked = search_ranked_db(conn, search)
+    while True:
+        page = get_contacts_page_db(conn, search, key, backward, limit, ranked=ranked)
+        rows = page + rows if backward else rows + page
+        if len(page) < limit:
+            return rows
+        key = page_key(page[0] if backward else page[-1])
+
+
+def test_shared_connection():
+    """Test the one shared connection can be used from several threads."""
+    conn, _ = make_db()
+
+    def add_some(n):
+        for i in range(25):
+            add_contact_db(conn, f"Thread {n} contact {i}", "", "")
+
+    threads = [threading.Thread(target=add_some, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    count = conn.execute("SELECT count(*) FROM contacts").fetchone()[0]
+    if count == 100 and len(walk_pages(conn, "thread")) == 100:
+        print("✅ 100 contacts added from 4 threads over one connection")
+        return True
+    print(f"❌ Expected 100 contacts, got {count}")
+    return False
+
+
+def test_fts_migration():
+    """Test an existing contacts.db gets its full-text index on first open."""
+    path = os.path.join(tempfile.mkdtemp(), "contacts.db")
+    old = sqlite3.connect(path)
+    old.execute(
+        "CREATE TABLE contacts (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "name TEXT NOT NULL, phone TEXT, email TEXT)"
+    )
+    old.executemany(
+        "INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)",
+        [("José Rizal", "0917", "jose@example.ph"), ("Ann Lee", None, None)],
+    )
+    old.commit()
+    old.close()
+
+    conn = init_db(path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    found = [row[1] for row in get_contacts_page_db(conn, "jose")]
+    add_contact_db(conn, "Joseph Cruz", "", "")
+    conn.close()
+
+    conn = init_db(path)                            # already migrated: no rebuild
+    reopened = [row[1] for row in get_contacts_page_db(conn, "jos")]
+    integrity = conn.execute(
+        "INSERT INTO contacts_fts(contacts_fts, rank) VALUES ('integrity-check', 1)"
+    )
+
+    broken = os.path.join(tempfile.mkdtemp(), "contacts.db")
+    table = sqlite3.connect(broken)
+    table.execute("CREATE TABLE contacts_fts (name TEXT)")   # not an FTS5 table
+    table.close()
+    try:
+        init_db(broken)
+        raised = False
+    except sqlite3.OperationalError:
+        raised = True                               # only a missing fts5 module falls back to LIKE
+
+    if (
+        conn.fts and version == SCHEMA_VERSION and integrity is not None and raised
+        and found == ["José Rizal"] and set(reopened) == {"José Rizal", "Joseph Cruz"}
+    ):
+        print("✅ Old database indexed on open, index kept in sync")
+        return True
+    print(f"❌ Migration gave version {version}, found {found}, then {reopened}; raised: {raised}")
+    return False
+
+
+def test_keyset_paging():
+    """Test paging both ways visits every row once, even with tied scores."""
+    conn, _ = make_db()
+    with conn.lock, conn:
+        # Identical contacts all get the same bm25 score
+        conn.executemany(
+            "INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)",
+            [("Same Name", "5550000", "same@example.org")] * 40
+            + [("Other Same", "5550000", "same@example.org")] * 20
+            + [("Broad Match", "", "")] * (RANK_LIMIT + 5),
+        )
+
+    results = {}
+    for search in ("", "same", "broad", "@"):       # all, ranked, id order, LIKE
+        forward = walk_pages(conn, search)
+        backward = walk_pages(conn, search, backward=True)
+        ids = [row[0] for row in forward]
+        results[search] = (len(forward), forward == backward and len(set(ids)) == len(ids))
+
+    ranked = walk_pages(conn, "same name")
+    scores = [row[4] for row in ranked]
+    if (
+        results[""] == (RANK_LIMIT + 65, True)
+        and results["same"] == (60, True)
+        and results["broad"] == (RANK_LIMIT + 5, True)
+        and results["@"] == (60, True)
+        and len(ranked) == 40 and len(set(scores)) == 1 and scores[0] < 0
+    ):
+        print("✅ Keyset pages cover every row once, forward and backward")
+        return True
+    print(f"❌ Unexpected pages: {results}")
+    return False
+
+
+class CancelAfter(threading.Event):
+    """An event that reads as set from its `calls`-th is_set() on.
+
+    SQLite's progress handler calls is_set() while the query runs, so this
+    cancels a query partway through without depending on timing.
+    """
+
+    def __init__(self, calls):
+        super().__init__()
+        self.calls = calls
+
+    def is_set(self):
+        self.calls -= 1
+        return self.calls <= 0
+
+
+def test_cancelled_search():
+    """Test a cancelled search stops mid-query and leaves the connection usable."""
+    conn, _ = make_db(2000)
+    conn.fts = False                                # a LIKE scan runs long enough
+
+    before = threading.Event()
+    before.set()
+    mid_query = CancelAfter(3)
+    cancelled_before = get_contacts_page_db(conn, "nobody", cancelled=before)
+    cancelled_mid = get_contacts_page_db(conn, "nobody", cancelled=mid_query)
+    after = get_contacts_page_db(conn, "person 199", cancelled=threading.Event())
+
+    if cancelled_before is None and cancelled_mid is None and mid_query.calls <= 0 and len(after) == 11:
+        print("✅ Cancelled searches return None, later ones still run")
+        return True
+    print(f"❌ Unexpected results: {cancelled_before}, {cancelled_mid}, {len(after or [])} rows")
+    return False
+
+
+def test_refresh_card():
+    """Test adding, editing and deleting one card in place."""
+    conn, _ = make_db(120)
+    page, view = make_list(conn)
+
+    hidden = add_contact_db(conn, "Late Arrival", "", "")
+    refresh_card(page, view, conn, hidden)          # belongs to a page not loaded yet
+    added_hidden = hidden in card_ids(view)
+
+    update_contact_db(conn, 5, "Renamed", "", "")
+    refresh_card(page, view, conn, 5)
+    index = card_ids(view).index(5)
+    name = view.controls[index].content.content.controls[0].controls[0].value
+
+    delete_contact_db(conn, 7)
+    refresh_card(page, view, conn, 7)
+    deleted = 7 not in card_ids(view) and 8 in card_ids(view)
+
+    search_page, search_view = make_list(conn, "person1")   # edits keep the active search
+    matching = len(card_ids(search_view))
+    update_contact_db(conn, 10, "Nobody", "", "")
+    refresh_card(search_page, search_view, conn, 10)
+
+    if (
+        not added_hidden and index == 4 and name == "Renamed" and deleted
+        and len(card_ids(search_view)) == matching - 1
+        and 10 not in card_ids(search_view) and search_view.data.search == "person1"
+    ):
+        print("✅ Cards added, replaced and removed in place")
+        return True
+    print(f"❌ Unexpected cards: {card_ids(view)}, {card_ids(search_view)}")
+    return False
+
+
+def test_refresh_card_at_capacity():
+    """Test a new contact appears when the list is full and scrolled to the end."""
+    conn, _ = make_db(1000)
+    page, view = make_list(conn)
+    scroll_to_end(page, view, conn)
+    before = card_ids(view)
+
+    new_id = add_contact_db(conn, "Newest Contact", "", "")
+    refresh_card(page, view, conn, new_id)
+    after = card_ids(view)
+
+    if (
+        len(before) == 300 and len(after) == 300
+        and after[-1] == new_id and after[:-1] == before[1:]
+        and not view.data.at_start and view.data.at_end
+        and len(view.controls) == 300
+    ):
+        print("✅ Full list dropped its first card to show the new one")
+        return True
+    print(f"❌ New contact {new_id} not shown: ...{after[-3:]}")
+    return False
+
+
+def test_rank_limit_crossed():
+    """Test a listing keeps one order when adds push it past RANK_LIMIT."""
+    conn, _ = make_db()
+    with conn.lock, conn:
+        # Varied bm25 scores, so ranked order differs from id order
+        conn.executemany(
+            "INSERT INTO contacts (name, phone, email) VALUES (?, ?, ?)",
+            [("Broad Match" if i % 3 else "Broad Broad", "", "") for i in range(RANK_LIMIT)],
+        )
+    page, view = make_list(conn, "broad", max_cards=RANK_LIMIT * 2)
+    ranked = view.data.ranked
+
+    new_id = add_contact_db(conn, "Broad Newcomer", "", "")   # now RANK_LIMIT + 1 matches
+    refresh_card(page, view, conn, new_id)
+    scroll_to_end(page, view, conn)
+    ids = card_ids(view)
+
+    if ranked and len(ids) == RANK_LIMIT + 1 and len(set(ids)) == len(ids) and new_id in ids:
+        print("✅ Crossing RANK_LIMIT mid-listing kept every card once")
+        return True
+    print(f"❌ {len(ids)} cards, {len(set(ids))} unique, newcomer shown: {new_id in ids}")
+    return False
+
+
+def test_search_while_page_loads():
+    """Test a new search is shown at once while a page query is still running."""
+    conn, _ = make_db(200)
+    page, view = make_list(conn)
+    ranked, rows = fetch_contacts(conn, "person 19")
+
+    with conn.lock:                                 # stands in for a slow page query
+        loader = threading.Thread(target=load_page, args=(page, view, conn))
+        loader.start()
+        while not view.data.loading:
+            pass
+        shown = threading.Thread(target=show_contacts, args=(page, view, conn, "person 19", rows, ranked))
+        shown.start()
+        shown.join(timeout=5)
+        blocked = shown.is_alive()
+    loader.join()
+
+    ids = card_ids(view)
+    if not blocked and view.data.search == "person 19" and len(ids) == 11 and len(view.controls) == 11:
+        print("✅ New search shown without waiting for the old page, which was dropped")
+        return True
+    print(f"❌ Search blocked: {blocked}, showing {len(ids)} cards for {view.data.search!r}")
+    return False
+
+
+def run_tests():
+    """Run all tests."""
+    print("Running Contact Book Tests\n")
+    print("=" * 50)
+
+    results = []
+    results.append(test_shared_connection())
+    results.append(test_fts_migration())
+    results.append(test_keyset_paging())
+    results.append(test_cancelled_search())
+    results.append(test_refresh_card())
+    results.append(test_refresh_card_at_capacity())
+    results.append(test_rank_limit_crossed())
+    results.append(test_search_while_page_loads())
+
+    print("\n" + "=" * 50)
+    passed = sum(results)
+    total = len(results)
+    print(f"\nTests Passed: {passed}/{total}")
+
+
+if __name__ == "__main__":
+    run_tests()